@@ -0,0 +1,173 @@
+"""
+Benchmarks of the hot paths of a refresh, against the code they replaced.
+Each checks the results are the same, then reports (rather than asserts on)
+the times of both, see pytest -s.
+"""
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import *
+
+from wsl_usb_gui.devices import Device as UsbipdDevice, DeviceRegistry
+from wsl_usb_gui.matcher import ProfileMatcher
+
+
+@dataclass
+class Profile:
+    BusId: Optional[str] = None
+    Description: Optional[str] = None
+    InstanceId: Optional[str] = None
+    enabled: bool = True
+
+
+@dataclass
+class Device:
+    BusId: str
+    Description: str
+    InstanceId: str
+
+
+def best_of(fn, repeat=3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_devices(rng: random.Random, count: int) -> List[Device]:
+    names = ["USB Serial Device", "CP2102 USB to UART", "STM32 STLink", "USB Input Device", "J-Link"]
+    devices = []
+    for i in range(count):
+        vid, pid = rng.choice(["0403", "10C4", "0483", "1366"]), f"{rng.randrange(0x10000):04X}"
+        devices.append(Device(
+            BusId=f"{i // 16 + 1}-{i % 16 + 1}",
+            Description=f"{rng.choice(names)} {i}",
+            InstanceId=f"USB\\VID_{vid}&PID_{pid}\\SN{i:06d}",
+        ))
+    return devices
+
+
+def make_profiles(rng: random.Random, devices: List[Device], count: int) -> List[Profile]:
+    profiles = []
+    for i in range(count):
+        device = rng.choice(devices)
+        kind = i % 6
+        if kind == 0:
+            profiles.append(Profile(InstanceId=device.InstanceId))
+        elif kind == 1:
+            profiles.append(Profile(BusId=device.BusId, Description="ignored, BusId set"))
+        elif kind == 2:
+            profiles.append(Profile(Description=device.Description))
+        elif kind == 3:
+            profiles.append(Profile(Description=f"re:^{re.escape(device.Description.split()[0])}.* {rng.randrange(2000)}$"))
+        elif kind == 4:
+            profiles.append(Profile(BusId=f"re:^{rng.randrange(20)}-", Description=f"re:{rng.randrange(2000)}$"))
+        else:
+            profiles.append(Profile(InstanceId=f"re:VID_{device.InstanceId[8:12]}&PID_{rng.randrange(0x10000):04X}"))
+    return profiles
+
+
+def old_compare(profile_value: str, device_value: str) -> bool:
+    profile_value = profile_value.strip()
+    device_value = device_value.strip()
+    if profile_value.startswith("re:"):
+        try:
+            return bool(re.compile(profile_value[3:], re.IGNORECASE).search(device_value))
+        except re.error:
+            return False
+    return profile_value == device_value
+
+
+def old_matches(profiles: List[Profile], device: Device) -> List[Profile]:
+    """
+    The per profile loop ProfileMatcher replaced.
+    """
+    matches = []
+    for profile in profiles:
+        desc = profile.Description
+        if (profile.InstanceId or profile.BusId) and not str(desc).startswith("re:"):
+            # Only fallback to description if no other filter set
+            desc = None
+        if profile.BusId and not old_compare(profile.BusId, device.BusId):
+            continue
+        if profile.InstanceId and not old_compare(profile.InstanceId, device.InstanceId):
+            continue
+        if desc and not old_compare(desc, device.Description):
+            continue
+        matches.append(profile)
+    return matches
+
+
+def test_bench_profile_matcher():
+    rng = random.Random(0)
+    devices = make_devices(rng, 200)
+    profiles = make_profiles(rng, devices, 1000)
+
+    matcher = ProfileMatcher(profiles)
+    expected = [old_matches(profiles, d) for d in devices]
+    assert [matcher.matches(d) for d in devices] == expected
+    assert [matcher.match(d) for d in devices] == [m[0] if m else None for m in expected]
+    assert sum(map(len, expected)) > len(devices) // 2  # Enough matches to be meaningful
+
+    old = best_of(lambda: [old_matches(profiles, d) for d in devices])
+
+    def new_matches():
+        # Includes building the matcher, done once per refresh
+        matcher = ProfileMatcher(profiles)
+        return [matcher.matches(d) for d in devices]
+
+    new = best_of(new_matches)
+    print(f"\n1000 profiles x 200 devices: per profile loop {old * 1000:.1f}ms, ProfileMatcher {new * 1000:.1f}ms")
+
+
+def old_find(devices: List[UsbipdDevice], selection) -> Optional[UsbipdDevice]:
+    """
+    The scan of get_selected_device() which DeviceRegistry.find() replaced
+    (which raised IndexError rather than returning None).
+    """
+    matches = [
+        d
+        for d in devices
+        if d.BusId == selection.BusId and d.Description == selection.Description
+    ]
+    return matches[0] if matches else None
+
+
+def test_bench_device_registry():
+    rng = random.Random(0)
+    # One in ten persisted but not connected (no BusId), some sharing a description
+    devices = [
+        UsbipdDevice(
+            None if i % 10 == 0 else d.BusId, "Persisted" if i % 20 == 0 else d.Description,
+            False, False, d.InstanceId, "", d.Description,
+        )
+        for i, d in enumerate(make_devices(rng, 500))
+    ]
+    # Rows as displayed, some renamed since (no longer found)
+    rows = []
+    for device in devices:
+        row = UsbipdDevice(**vars(device))
+        if rng.random() < 0.1:
+            row.Description += " (renamed)"
+        rows.append(row)
+
+    registry = DeviceRegistry(devices)
+    expected = [old_find(devices, r) for r in rows]
+    found = [registry.find(r) for r in rows]
+    # Same objects, not just equal ones
+    assert [id(f) for f in found] == [id(e) for e in expected]
+    assert None in expected
+    assert all(registry.by_bus_id[d.BusId] is d for d in devices if d.BusId)
+
+    old = best_of(lambda: [old_find(devices, r) for r in rows])
+
+    def new_find():
+        # Includes building the registry, done once per refresh
+        registry = DeviceRegistry(devices)
+        return [registry.find(r) for r in rows]
+
+    new = best_of(new_find)
+    print(f"\n500 devices: linear scans {old * 1000:.1f}ms, DeviceRegistry {new * 1000:.2f}ms")
@@ -0,0 +1,77 @@
+"""
+Startup cost of importing the gui, which happens on every (minimised) start at login.
+The gui itself can only be imported on Windows with wxPython installed, the
+wx-free modules it's built on are checked everywhere.
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import *
+
+import pytest
+
+# Cumulative import time of wsl_usb_gui.gui, almost all of which is wx
+BUDGET_MS = 1500
+# The wx-free modules, mostly asyncio
+CORE_MODULES = (
+    "wsl_usb_gui.devices", "wsl_usb_gui.matcher", "wsl_usb_gui.process",
+    "wsl_usb_gui.scheduler", "wsl_usb_gui.udev", "wsl_usb_gui.wsl",
+)
+CORE_BUDGET_MS = 300
+# Only imported when first used
+LAZY_MODULES = ("wsl_usb_gui.install", "wsl_usb_gui.win_usb_inspect")
+
+
+def import_times(module: str, code: str = "", env: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """
+    Cumulative import time (us) of every module imported by importing module, in a fresh
+    interpreter, which then runs code.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}\n{code}"],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    # import time: self [us] | cumulative | imported package
+    for match in re.finditer(r"^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", result.stderr, re.MULTILINE):
+        times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def test_core_import_time_and_side_effects(tmp_path):
+    # appdirs puts APP_DIR under these, which importing mustn't create or log to
+    env = dict(os.environ, HOME=str(tmp_path), XDG_DATA_HOME=str(tmp_path / "data"), LOCALAPPDATA=str(tmp_path))
+    times = {}
+    for module in CORE_MODULES:
+        times.update(import_times(
+            module,
+            "import logging; from wsl_usb_gui.logger import APP_DIR\n"
+            "assert not logging.getLogger().handlers, 'logging configured on import'\n"
+            "assert not APP_DIR.exists(), 'APP_DIR created on import'",
+            env=env,
+        ))
+        cumulative_ms = times[module] / 1000
+        print(f"\nimport {module}: {cumulative_ms:.0f}ms")
+        assert cumulative_ms < CORE_BUDGET_MS
+    assert not any(tmp_path.iterdir())
+
+
+def test_gui_import_time():
+    pytest.importorskip("winreg")
+    pytest.importorskip("wx")
+    pytest.importorskip("wxasync")
+
+    times = import_times("wsl_usb_gui.gui")
+    assert "wsl_usb_gui.gui" in times
+    cumulative_ms = times["wsl_usb_gui.gui"] / 1000
+    print(f"\nimport wsl_usb_gui.gui: {cumulative_ms:.0f}ms")
+    assert cumulative_ms < BUDGET_MS
+
+    for module in LAZY_MODULES:
+        assert module not in times, f"{module} should be imported lazily"
@@ -0,0 +1,141 @@
+"""
+Render benchmark of the device lists: the DataViewCtrl based ListCtrl against the
+UltimateListCtrl it replaced, filling and then refreshing a list until painted.
+Only runs where the gui can be imported, ie. Windows with wxPython installed.
+"""
+import time
+from dataclasses import astuple
+from typing import *
+
+import pytest
+
+pytest.importorskip("winreg")
+wx = pytest.importorskip("wx")
+pytest.importorskip("wxasync")
+ulc = pytest.importorskip("wx.lib.agw.ultimatelistctrl")
+
+from wsl_usb_gui.devices import Device
+from wsl_usb_gui.gui import DEVICE_COLUMNS, HighlightAnimator, ListCtrl
+
+ROWS = 100
+REFRESHES = 10
+
+
+class OldListCtrl(ulc.UltimateListCtrl):
+    """
+    The UltimateListCtrl fill path the device lists used: every refresh cleared
+    the list and appended each device again, one item per cell.
+    """
+
+    def __init__(self, parent):
+        ulc.UltimateListCtrl.__init__(
+            self, parent, wx.ID_ANY,
+            agwStyle=ulc.ULC_REPORT | ulc.ULC_NO_SORT_HEADER | ulc.ULC_SINGLE_SEL | ulc.ULC_NO_ITEM_DRAG,
+        )
+        self.devices = []
+        self.columns = []
+
+    def InsertColumns(self, names):
+        for i, name in enumerate(names):
+            info = ulc.UltimateListItem()
+            info._mask = wx.LIST_MASK_TEXT
+            info._image = []
+            info._format = 0
+            info._kind = 1
+            info._text = name
+            self.InsertColumnInfo(i, info)
+            self.SetColumnWidth(i, 50 if i != 1 else -3)
+        self.columns = names
+
+    def DeleteAllItems(self):
+        ulc.UltimateListCtrl.DeleteAllItems(self)
+        self.devices.clear()
+
+    def Append(self, device):
+        details = astuple(device)[0 : self.GetColumnCount()]
+        pos = self.GetItemCount()
+        self.InsertStringItem(pos, str(details[0] or "---"))
+        for i in range(1, len(details)):
+            if i == 1:
+                self.SetStringItem(pos, i, str(details[i]))
+            else:
+                info = ulc.UltimateListItem()
+                info._text = ""
+                info._mask = ulc.ULC_MASK_TEXT | ulc.ULC_MASK_KIND
+                info._kind = 1
+                info.Check(getattr(device, self.columns[i]))
+                info._itemId = pos
+                info._col = i
+                self.SetItem(info)
+        self.devices.append(device)
+
+
+def make_devices(refresh: int) -> List[Device]:
+    # Each refresh one device changes state, as is typical
+    return [
+        Device(
+            BusId=f"{i // 16 + 1}-{i % 16 + 1}", Description=f"USB Serial Device {i}",
+            bound=(i == refresh % ROWS) != (i % 2 == 0), forced=False,
+            InstanceId=f"USB\\VID_0403&PID_6001\\SN{i:06d}", Attached="", OrigDescription="",
+        )
+        for i in range(ROWS)
+    ]
+
+
+def painted(frame: wx.Frame, ctrl: wx.Window):
+    ctrl.Refresh()
+    ctrl.Update()
+    wx.SafeYield(frame, onlyIfNeeded=True)
+
+
+@pytest.fixture
+def frame():
+    app = wx.App(False)
+    frame = wx.Frame(None, size=(800, 2000))
+    frame.Show()
+    yield frame
+    frame.Destroy()
+    app.Destroy()
+
+
+def test_bench_list_render(frame):
+    old = OldListCtrl(frame)
+    old.InsertColumns(DEVICE_COLUMNS)
+    new = ListCtrl(frame, type=Device, highlighter=HighlightAnimator(frame))
+    new.InsertColumns(DEVICE_COLUMNS)
+    sizer = wx.BoxSizer(wx.HORIZONTAL)
+    sizer.Add(old, 1, wx.EXPAND)
+    sizer.Add(new, 1, wx.EXPAND)
+    frame.SetSizer(sizer)
+    frame.Layout()
+
+    def old_refresh(devices):
+        old.DeleteAllItems()
+        for device in devices:
+            old.Append(device)
+        painted(frame, old)
+
+    def new_refresh(devices):
+        new.SetDevices(devices)
+        painted(frame, new)
+
+    timings = {}
+    for name, refresh in (("UltimateListCtrl", old_refresh), ("ListCtrl", new_refresh)):
+        start = time.perf_counter()
+        refresh(make_devices(0))
+        fill = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(1, REFRESHES + 1):
+            refresh(make_devices(i))
+        timings[name] = (fill, (time.perf_counter() - start) / REFRESHES)
+
+    # Both show the same rows
+    assert old.GetItemCount() == new.GetItemCount() == ROWS
+    final = make_devices(REFRESHES)
+    for row in (0, ROWS // 2, ROWS - 1):
+        assert old.GetItem(row, 1).GetText() == new.model.rows[row][1] == final[row].Description
+        assert new.model.rows[row][2] == final[row].bound
+
+    print(f"\n{ROWS} rows, fill / refresh until painted:")
+    for name, (fill, refresh) in timings.items():
+        print(f"  {name}: {fill * 1000:.1f}ms / {refresh * 1000:.1f}ms")
@@ -0,0 +1,28 @@
+import re
+
+import pytest
+
+from wsl_usb_gui.matcher import RegexCache
+
+
+def test_invalid_pattern_reported_once_and_raised_fresh(caplog):
+    cache = RegexCache()
+    errors = []
+    for _ in range(3):
+        with pytest.raises(re.error) as info:
+            cache.compile("(")
+        errors.append(info.value)
+    assert len({id(e) for e in errors}) == 3
+    assert all(e.msg == errors[0].msg and e.pattern == "(" and e.pos == 0 for e in errors)
+    assert len([r for r in caplog.records if "Invalid regex" in r.message]) == 1
+
+
+def test_least_recently_used_evicted():
+    cache = RegexCache(maxsize=2)
+    a = cache.compile("a")
+    cache.compile("b")
+    assert cache.compile("a") is a  # Now most recently used
+    cache.compile("c")
+    assert len(cache) == 2
+    assert cache.compile("a") is a
+    assert cache.compile("B").search("b")  # Case insensitive
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+
+import pytest
+
+from wsl_usb_gui.scheduler import AttachBackoff, RefreshScheduler
+
+
+class VirtualClock:
+    """
+    Time only moves on advance(), waking the sleepers which are then due.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._sleepers = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        future = asyncio.get_running_loop().create_future()
+        self._sleepers.append((self.now + delay, future))
+        await future
+
+    async def advance(self, seconds: float, step: float = 0.1):
+        end = self.now + seconds
+        while self.now < end - 1e-9:
+            self.now = round(min(end, self.now + step), 9)
+            for sleeper in list(self._sleepers):
+                due, future = sleeper
+                if due <= self.now + 1e-9:
+                    self._sleepers.remove(sleeper)
+                    if not future.done():
+                        future.set_result(None)
+            await settle()
+
+
+async def settle():
+    # Let woken tasks run until they block again
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class Harness:
+    def __init__(self, max_wait=3.0):
+        self.clock = VirtualClock()
+        self.refreshes = []  # Virtual time each refresh started
+        self.release = None  # Set to an Event to hold refreshes until it's set
+        self.fail = False
+        self.scheduler = RefreshScheduler(
+            self.refresh, max_wait=max_wait, clock=self.clock, sleep=self.clock.sleep
+        )
+
+    async def refresh(self):
+        self.refreshes.append(self.clock.now)
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            self.fail = False
+            raise RuntimeError("refresh broke")
+
+
+def run(coro):
+    asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_burst_is_coalesced_into_one_refresh():
+    async def main():
+        h = Harness()
+        for _ in range(5):
+            h.scheduler.trigger(0.5)
+            await h.clock.advance(0.2)
+        # Last request at 0.8, due at 1.3
+        assert h.refreshes == []
+        assert h.scheduler.pending
+        await h.clock.advance(1.0)
+        assert h.refreshes == [pytest.approx(1.3)]
+        assert not h.scheduler.pending
+
+    run(main())
+
+
+def test_no_delay_refreshes_straight_away():
+    async def main():
+        h = Harness()
+        h.scheduler.trigger()
+        await settle()
+        assert h.refreshes == [0.0]
+
+    run(main())
+
+
+def test_requests_keep_coming_until_max_wait():
+    async def main():
+        h = Harness(max_wait=3.0)
+        # A request every 0.5s, each delaying the refresh by another 1s
+        for _ in range(10):
+            h.scheduler.trigger(1.0)
+            await h.clock.advance(0.5)
+        # Capped at max_wait after the first request, then again 3s after the next
+        assert h.refreshes == [pytest.approx(3.0)]
+        await h.clock.advance(5.0)
+        assert h.refreshes == [pytest.approx(3.0), pytest.approx(5.5)]
+
+    run(main())
+
+
+def test_requests_during_refresh_get_one_follow_up():
+    async def main():
+        h = Harness()
+        h.release = asyncio.Event()
+        h.scheduler.trigger()
+        await settle()
+        assert h.scheduler.running
+        for _ in range(3):
+            h.scheduler.trigger(0.5)
+            await h.clock.advance(0.1)
+        h.release.set()
+        await h.clock.advance(2.0)
+        assert h.refreshes == [0.0, pytest.approx(0.7)]
+        assert not h.scheduler.running and not h.scheduler.pending
+
+    run(main())
+
+
+def test_failed_refresh_is_logged_and_scheduler_continues(caplog):
+    async def main():
+        h = Harness()
+        h.fail = True
+        h.scheduler.trigger()
+        await settle()
+        assert not h.scheduler.running
+        h.scheduler.trigger()
+        await settle()
+        assert h.refreshes == [0.0, 0.0]
+
+    with caplog.at_level(logging.ERROR):
+        run(main())
+    assert [r.message for r in caplog.records] == ["refresh failed"]
+    assert "refresh broke" in caplog.records[0].exc_text
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr("wsl_usb_gui.scheduler.time.monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_failure_then_allows_one_trial(clock):
+    backoff = AttachBackoff()
+    assert backoff.allow()
+    delay = backoff.failure()
+    assert AttachBackoff.BASE_DELAY / 2 <= delay <= AttachBackoff.BASE_DELAY
+    assert backoff.state == "open"
+    assert not backoff.allow()
+    assert "重试" in backoff.describe()
+
+    clock.now += delay
+    assert backoff.allow()
+    assert backoff.state == "half-open"
+    # Only the one trial until it's reported
+    assert not backoff.allow()
+
+    backoff.success()
+    assert backoff.state == "closed" and backoff.failures == 0
+    assert backoff.allow()
+    assert backoff.describe() == ""
+
+
+def test_breaker_trial_without_outcome_is_released(clock):
+    backoff = AttachBackoff()
+    clock.now += backoff.failure()
+
+    async def trial():
+        assert backoff.allow()
+        try:
+            await asyncio.sleep(10)  # Attach, cancelled part way
+        finally:
+            backoff.release()
+
+    async def main():
+        task = asyncio.create_task(trial())
+        await settle()
+        assert backoff.state == "half-open" and not backoff.allow()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    run(main())
+    # Not stuck half-open, nor counted as another failure
+    assert backoff.state == "open" and backoff.failures == 1
+    assert backoff.allow()
+    backoff.success()
+    backoff.release()  # No trial, no change
+    assert backoff.state == "closed"
+
+
+def test_breaker_backoff_grows_up_to_max_delay(clock):
+    backoff = AttachBackoff()
+    delays = []
+    for _ in range(12):
+        delays.append(backoff.failure())
+        clock.now = backoff.retry_at
+        assert backoff.allow()
+    for failures, delay in enumerate(delays, 1):
+        limit = min(AttachBackoff.MAX_DELAY, AttachBackoff.BASE_DELAY * 2 ** (failures - 1))
+        assert limit / 2 <= delay <= limit
+    assert max(delays) <= AttachBackoff.MAX_DELAY
+    assert backoff.failures == 12
@@ -0,0 +1,98 @@
+import pytest
+
+from wsl_usb_gui.udev import (
+    LOW_LATENCY_RUN,
+    USBFS_MEMORY_PARAM,
+    DeviceRuleSettings,
+    UdevRules,
+    device_rules,
+    parse_device_settings,
+)
+
+VID, PID, SERIAL, NAME = "0403", "6001", "A10K1234", "FT232R_USB_UART"
+BASE = f'ATTRS{{idVendor}}=="{VID}",ATTRS{{idProduct}}=="{PID}",ENV{{ID_SERIAL_SHORT}}=="{SERIAL}"'
+
+
+def rules(**kw):
+    return device_rules(VID, PID, SERIAL, NAME, DeviceRuleSettings(**kw))
+
+
+def test_no_settings_no_rules():
+    assert rules() == []
+
+
+def test_permissions():
+    assert rules(permissions=True) == [
+        f'SUBSYSTEM=="usb|hidraw",{BASE},MODE="0666",SYMLINK+="usb/{NAME}"',
+        f'SUBSYSTEM=="tty",{BASE},MODE="0666",SYMLINK+="tty/{NAME}"',
+    ]
+
+
+def test_command():
+    assert rules(command="/usr/bin/logger hi") == [
+        f'SUBSYSTEM=="usb|hidraw",{BASE},RUN+="/usr/bin/logger hi"',
+        f'SUBSYSTEM=="tty",{BASE},RUN+="/usr/bin/logger hi"',
+    ]
+
+
+def test_permissions_and_command():
+    assert rules(permissions=True, command="/bin/true") == [
+        f'SUBSYSTEM=="usb|hidraw",{BASE},MODE="0666",SYMLINK+="usb/{NAME}",RUN+="/bin/true"',
+        f'SUBSYSTEM=="tty",{BASE},MODE="0666",SYMLINK+="tty/{NAME}",RUN+="/bin/true"',
+    ]
+
+
+def test_serial_tuning():
+    assert rules(latency_timer=1, low_latency=True) == [
+        f'SUBSYSTEM=="usb|hidraw",{BASE}',
+        f'SUBSYSTEM=="tty",{BASE},ATTR{{device/latency_timer}}="1",RUN+="{LOW_LATENCY_RUN}"',
+    ]
+
+
+def test_bulk_throughput():
+    assert rules(bulk_throughput=True) == [
+        f'SUBSYSTEM=="usb|hidraw",{BASE}',
+        f'SUBSYSTEM=="tty",{BASE}',
+        f'SUBSYSTEM=="usb",ENV{{DEVTYPE}}=="usb_device",{BASE},'
+        'ATTR{power/control}="on",ATTR{power/autosuspend}="-1"',
+    ]
+
+
+@pytest.mark.parametrize("settings", [
+    DeviceRuleSettings(permissions=True),
+    DeviceRuleSettings(command="/usr/local/bin/on-connect.sh"),
+    DeviceRuleSettings(permissions=True, command="/bin/true"),
+    DeviceRuleSettings(latency_timer=2),
+    DeviceRuleSettings(low_latency=True, command="/bin/true"),
+    DeviceRuleSettings(bulk_throughput=True),
+    DeviceRuleSettings(True, "/bin/true", 4, True, True),
+])
+def test_round_trip(settings):
+    assert parse_device_settings(device_rules(VID, PID, SERIAL, NAME, settings)) == settings
+
+
+def test_set_device_replaces_in_place():
+    other = f'SUBSYSTEM=="usb",ATTRS{{idVendor}}=="1234",ATTRS{{idProduct}}=="5678",ENV{{ID_SERIAL_SHORT}}=="X",MODE="0666"'
+    model = UdevRules("\n".join([other] + rules(permissions=True)) + "\n")
+    model.set_device(VID, PID, SERIAL, NAME, DeviceRuleSettings(latency_timer=1))
+    assert model.lines[0] == other
+    assert model.lines[1:] == rules(latency_timer=1)
+    assert model.settings(VID, PID, SERIAL) == DeviceRuleSettings(latency_timer=1)
+    assert model.changed
+
+    model.set_device(VID, PID, SERIAL, NAME, DeviceRuleSettings())
+    assert model.lines == [other]
+
+
+def test_usbfs_memory():
+    model = UdevRules()
+    assert model.usbfs_memory() is None
+    model.set_usbfs_memory(256)
+    assert model.usbfs_memory() == 256
+    model.set_usbfs_memory(512)
+    assert model.usbfs_memory() == 512
+    assert len(model.lines) == 1
+    assert UdevRules(model.render()).usbfs_memory() == 512
+    model.set_usbfs_memory(None)
+    assert model.lines == []
+    assert model._commands[-1] == f"echo 16 > {USBFS_MEMORY_PARAM}"
@@ -1,4 +1,6 @@
-from .logger import log
+from .logger import log, setup_logging
+
+setup_logging()
 
 try:
     from . import gui
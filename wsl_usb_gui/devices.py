@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import *
+
+
+@dataclass
+class Device:
+    BusId: str
+    Description: str
+    bound: bool
+    forced: bool
+    InstanceId: str
+    Attached: str
+    OrigDescription: str
+    Status: str = ""  # Extra state shown alongside the description
+
+    def __eq__(self, __value: object) -> bool:
+        if not isinstance(__value, Device):
+            return False
+        return (
+            self.BusId == __value.BusId and self.InstanceId == __value.InstanceId
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.BusId, self.InstanceId))
+
+
+class DeviceRegistry:
+    """
+    The devices reported by usbipd in the last refresh, in usbipd order and
+    indexed by BusId and InstanceId. Devices which aren't connected have no BusId.
+    """
+    def __init__(self, devices: Iterable[Device] = ()):
+        self.devices: List[Device] = list(devices)
+        self.by_bus_id: Dict[str, Device] = {d.BusId: d for d in self.devices if d.BusId}
+        self.by_instance_id: Dict[str, Device] = {d.InstanceId: d for d in self.devices}
+        # First device of each (BusId, Description), see find()
+        self._by_row: Dict[Tuple[Optional[str], str], Device] = {}
+        for d in self.devices:
+            self._by_row.setdefault((d.BusId, d.Description), d)
+
+    def __iter__(self) -> Iterator[Device]:
+        return iter(self.devices)
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def find(self, device) -> Optional[Device]:
+        """
+        The current entry for device (eg. a row from one of the lists): the first with
+        the same BusId and Description, as rows have always been matched.
+        """
+        return self._by_row.get((device.BusId, device.Description))
@@ -1,79 +1,52 @@
 import appdirs
 import asyncio
+import base64
 import json
 import logging
 import logging.handlers
 import os
-import serial.tools.list_ports
 import re
+import shutil
 import sys
-from collections import namedtuple
+import threading
+import time
 from dataclasses import dataclass, astuple
 from functools import partial
 from pathlib import Path
 from typing import *
-import webbrowser
 import winreg
 import argparse
 
 import wx
 import wx.adv
 import wxasync
-from wx.lib.agw.ultimatelistctrl import (
-    UltimateListCtrl,
-    UltimateListItem,
-    ULC_REPORT,
-    ULC_NO_SORT_HEADER,
-    ULC_SINGLE_SEL,
-    ULC_NO_ITEM_DRAG,
-    ULC_MASK_KIND,
-    ULC_MASK_TEXT,
-    EVT_LIST_ITEM_CHECKED,
-    UltimateListMainWindow,
-    ULC_HAS_VARIABLE_ROW_HEIGHT
-)
+import wx.dataview
+import wx.lib.newevent
 
 from .version import __version__
 from .usb_monitor import registerDeviceNotification, unregisterDeviceNotification, WM_SHOW_EXISTING
-from .win_usb_inspect import InspectUsbDevices, gDeviceList
-from .logger import log, APP_DIR
-from .install import MSI_VERS
+from .logger import log, setup_logging, APP_DIR
+from .process import CREATE_NO_WINDOW, run
+from .wsl import KeepWarm, UdevMonitor, WslShell
+from .udev import DeviceRuleSettings, UdevRulesCache
+from .scheduler import AttachBackoff, RefreshScheduler
+from .matcher import ProfileMatcher, regex_cache
+from .devices import Device, DeviceRegistry
 
-# High DPI Support.
 import ctypes
 
-try:
-    ctypes.windll.shcore.SetProcessDpiAwareness(True)
-except:
-    pass
+# Posted by ListCtrl when a checkbox column is toggled, with Index, Column and Checked.
+ListItemCheckedEvent, EVT_LIST_ITEM_CHECKED = wx.lib.newevent.NewCommandEvent()
 
 DEVICE_COLUMNS = ["bus_id", "description", "bound", "forced"]
 ATTACHED_COLUMNS = ["bus_id", "description", "forced"]  # , "client"]
 PROFILES_COLUMNS = ["bus_id", "description", "enabled"]
 
 CONFIG_FILE = APP_DIR / "config.json"
+USBIPD_CACHE_FILE = APP_DIR / "usbipd.json"
 
-ProcResult = namedtuple("ProcResult", ("stdout", "stderr", "returncode"))
-
-@dataclass
-class Device:
-    BusId: str
-    Description: str
-    bound: bool
-    forced: bool
-    InstanceId: str
-    Attached: str
-    OrigDescription: str
-
-    def __eq__(self, __value: object) -> bool:
-        if not isinstance(__value, Device):
-            return False
-        return (
-            self.BusId == __value.BusId and self.InstanceId == __value.InstanceId
-        )
-
-    def __hash__(self) -> int:
-        return hash((self.BusId, self.InstanceId))
+# Attach errors reported from the usbip client side in WSL
+WSL_CLIENT_ERRORS = ("vhci", "usbip: error", "udev", "wsl: error")
 
 @dataclass
 class Profile:
@@ -86,12 +59,23 @@ class Profile:
         if self.enabled is None:
             self.enabled = True
 
+
+# Predicates for the device transitions that can be awaited with wait_for_device_state().
+# The device argument is None if the BusId is no longer reported by usbipd.
+DEVICE_STATES: Dict[str, Callable[[Optional[Device]], bool]] = {
+    "bound": lambda d: d is not None and d.bound,
+    "unbound": lambda d: d is None or not d.bound,
+    "attached": lambda d: d is not None and bool(d.Attached),
+    "detached": lambda d: d is None or not d.Attached,
+}
+
 gui: Optional["WslUsbGui"] = None
 loop = None
 INSTALLED_DEPS = False
 
 USBIPD_default = Path("C:\\Program Files\\usbipd-win\\usbipd.exe")
 USBIPD_VERSION: Tuple[int, ...] = (0, 0, 0)
+USBIPD_COMMANDS: Set[str] = set()  # Top level commands listed by `usbipd --help`
 if USBIPD_default.exists():
     USBIPD = USBIPD_default
 else:
@@ -99,31 +83,6 @@ else:
     USBIPD = "usbipd"
 
 
-async def run(args, decode=True):
-    CREATE_NO_WINDOW = 0x08000000
-    if isinstance(args, str):
-        proc = await asyncio.create_subprocess_shell(
-            args,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            creationflags=CREATE_NO_WINDOW,
-        )
-    else:
-        proc = await asyncio.create_subprocess_exec(
-            *args,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            creationflags=CREATE_NO_WINDOW,
-        )
-
-    stdout, stderr = await proc.communicate()
-    # Recreate a basic "process results" object to return.
-    if decode:
-        return ProcResult(stdout.decode(), stderr.decode(), proc.returncode)
-    else:
-        return ProcResult(stdout, stderr, proc.returncode)
-
-
 def get_resource(name):
     fname = Path(sys.executable).parent / name
     if not fname.exists():
@@ -140,6 +99,176 @@ def get_icon(name="usb.ico"):
         return wx.Icon(str(icon), wx.BITMAP_TYPE_ICO)
 
 
+class DeviceOperationQueue:
+    """
+    Serialises usbipd operations (attach, detach, bind, unbind) per device.
+    Operations for different devices run in parallel.
+    Submitting an operation identical to one already pending or running returns
+    the existing result rather than running it again, and a queued detach / unbind
+    drops any pending attach / bind it makes obsolete (their result is None).
+    """
+    OBSOLETES = {
+        "detach": ("attach",),
+        "unbind": ("bind",),
+    }
+
+    def __init__(self):
+        self._pending: Dict[str, List[Tuple[tuple, Callable[[], Awaitable], asyncio.Future]]] = {}
+        self._running: Dict[str, Tuple[tuple, asyncio.Future]] = {}
+
+    async def submit(self, key: str, op: tuple, factory: Callable[[], Awaitable]):
+        # Shielded so a cancelled caller doesn't cancel the result shared with others
+        return await asyncio.shield(self._enqueue(key, op, factory))
+
+    def _enqueue(self, key: str, op: tuple, factory: Callable[[], Awaitable]) -> asyncio.Future:
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+            asyncio.create_task(self._worker(key))
+
+        running = self._running.get(key)
+        if running and running[0] == op and not pending:
+            return running[1]
+
+        for p_op, _, future in pending:
+            if p_op == op:
+                return future
+
+        obsolete = self.OBSOLETES.get(op[0], ())
+        for entry in [p for p in pending if p[0][0] in obsolete]:
+            log.info(f"{key}: dropping {entry[0][0]}, superseded by {op[0]}")
+            pending.remove(entry)
+            entry[2].set_result(None)
+
+        future = asyncio.get_running_loop().create_future()
+        pending.append((op, factory, future))
+        return future
+
+    async def _worker(self, key: str):
+        pending = self._pending[key]
+        try:
+            while pending:
+                op, factory, future = pending.pop(0)
+                self._running[key] = (op, future)
+                try:
+                    result = await factory()
+                    if not future.done():
+                        future.set_result(result)
+                except Exception as ex:
+                    if not future.done():
+                        future.set_exception(ex)
+                finally:
+                    del self._running[key]
+        finally:
+            del self._pending[key]
+
+
+class AutoAttachSupervisor:
+    """
+    Runs one `usbipd attach --wsl --auto-attach` process per BusId, which re-attaches
+    the device itself as soon as it re-enumerates, without waiting for a refresh.
+    Processes that exit are restarted with backoff, unless they keep exiting
+    straight away (eg. the device is unusable), then that BusId is given up on
+    and left to the normal auto-attach on refresh.
+    """
+    # `attach --wsl --auto-attach` as run here
+    MIN_VERSION = (4, 0, 0)
+    # A process that stayed up this long counts as having worked
+    HEALTHY_TIME = 60.0
+    # Consecutive exits within QUICK_EXIT_TIME of starting before giving up
+    QUICK_EXIT_TIME = 5.0
+    MAX_QUICK_EXITS = 5
+
+    def __init__(self, on_change: Optional[Callable[[str], None]] = None):
+        self.on_change = on_change
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.status: Dict[str, str] = {}
+        self.failed: Set[str] = set()  # Given up on, until no longer requested
+
+    @staticmethod
+    def supported() -> bool:
+        return USBIPD_VERSION >= AutoAttachSupervisor.MIN_VERSION
+
+    @property
+    def bus_ids(self) -> Set[str]:
+        return set(self._tasks)
+
+    def update(self, bus_ids: Iterable[str]):
+        """
+        Supervise exactly these BusIds, starting / stopping processes as needed.
+        """
+        bus_ids = set(bus_ids)
+        self.failed &= bus_ids
+        for bus_id in self.bus_ids - bus_ids:
+            log.info(f"Auto-attach {bus_id}: stopping")
+            self._tasks.pop(bus_id).cancel()
+            self.status.pop(bus_id, None)
+        for bus_id in bus_ids - self.bus_ids - self.failed:
+            self._tasks[bus_id] = asyncio.create_task(self._supervise(bus_id))
+
+    async def close(self):
+        self.update(())
+
+    def _set_status(self, bus_id, status):
+        if self.status.get(bus_id) != status:
+            self.status[bus_id] = status
+            if self.on_change:
+                self.on_change(bus_id)
+
+    async def _supervise(self, bus_id: str):
+        backoff = AttachBackoff()
+        quick_exits = 0
+        while True:
+            command = usbipd_wsl_command("attach", bus_id) + ["--auto-attach"]
+            start = time.monotonic()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    creationflags=CREATE_NO_WINDOW,
+                )
+            except OSError as ex:
+                log.error(f"Auto-attach {bus_id}: {ex}")
+                proc = None
+            else:
+                log.info(f"Auto-attach {bus_id}: started (pid {proc.pid})")
+                self._set_status(bus_id, "usbipd 自动附加")
+                try:
+                    while line := await proc.stdout.readline():
+                        log.info(f"Auto-attach {bus_id}: {line.decode(errors='replace').rstrip()}")
+                    await proc.wait()
+                except asyncio.CancelledError:
+                    try:
+                        proc.kill()
+                    except ProcessLookupError:
+                        pass
+                    raise
+                log.warning(f"Auto-attach {bus_id}: exited ({proc.returncode})")
+
+            returncode = proc.returncode if proc else "-"
+            uptime = time.monotonic() - start
+            quick_exits = quick_exits + 1 if uptime < self.QUICK_EXIT_TIME else 0
+            if quick_exits >= self.MAX_QUICK_EXITS:
+                log.error(
+                    f"Auto-attach {bus_id}: usbipd exited immediately {quick_exits} times ({returncode}), "
+                    "giving up, the device will be auto-attached on refresh instead"
+                )
+                self._tasks.pop(bus_id, None)
+                self.failed.add(bus_id)
+                self.status.pop(bus_id, None)
+                if self.on_change:
+                    self.on_change(bus_id)
+                return
+            if uptime > self.HEALTHY_TIME:
+                backoff.success()
+            delay = backoff.failure()
+            log.info(f"Auto-attach {bus_id}: restarting in {delay:.0f}s")
+            self._set_status(bus_id, f"usbipd 自动附加已退出 ({returncode})，等待重启")
+            await asyncio.sleep(delay)
+
+
 class WslUsbGui(wx.Frame):
     def __init__(self, minimised=False):
         wx.Frame.__init__(self, None, title=f"WSL USB 管理器 {__version__}")
@@ -155,20 +284,36 @@ class WslUsbGui(wx.Frame):
         # On first close, alert the user it's being minimised to tray
         self.informed_about_tray = False
 
-        self.usb_devices: List[Device] = []
+        self.usb_devices = DeviceRegistry()
+        self.raw_devices: Dict[str, Any] = {}  # InspectUsbDevices() results from the last refresh
         self.pinned_profiles: List[Profile] = []
         self.name_mapping = dict()
-        self.hidden_devices = list()
+        self.hidden_devices: Set[str] = set()  # InstanceIds
         self.show_hidden = False
-        self.refreshing = False
-        self.refreshing_delay = False
-        self._regex_cache = {}  # Cache for compiled regex patterns
+        self.refresh_scheduler = RefreshScheduler(self.refresh_task)
+        self._profile_matcher: Optional[ProfileMatcher] = None  # Enabled profiles, see profile_matcher
+        self.attach_backoff: Dict[str, AttachBackoff] = {}  # Auto-attach failures by InstanceId
+        self._autobind_ids: Optional[Set[str]] = None  # Hardware ids with an AutoBind policy, see autobind_ids
+        self.device_ops = DeviceOperationQueue()
+        self.wsl = WslShell()
+        self.udev_rules = UdevRulesCache(self.wsl)
+        self.udev_rules_requested = False
+        self.udev_monitor = UdevMonitor()
+        self.udev_monitor_start: Optional[asyncio.Task] = None
+        self.wsl_ready: Optional[asyncio.Task] = None
+        self.keep_warm = KeepWarm()
+        self.auto_attach = AutoAttachSupervisor(on_change=self.auto_attach_changed)
 
         self.auto_start_at_boot = False
         self.close_to_tray = True
         # Whether to flash taskbar / request user attention when a new USB device appears while unfocussed
         self.notify_on_new_device = True
-
+        # Hold the WSL VM open while any auto-attach profile is enabled
+        self.keep_wsl_warm = False
+        # Let usbipd keep devices pinned by BusId attached (attach --auto-attach)
+        self.usbipd_auto_attach = False
+        # Bind / add policies for pinned devices at startup
+        self.prepare_pinned_at_start = False
 
         self.load_config()
 
@@ -184,6 +329,8 @@ class WslUsbGui(wx.Frame):
         self.Bind(wx.EVT_MENU, self._open_logs_folder, logs_menu)
         hide_menu = self.filemenu.Append(wx.ID_ANY, "最&小化"," 最小化到托盘")
         self.Bind(wx.EVT_MENU, self.minimise, hide_menu)
+        prepare_menu = self.filemenu.Append(wx.ID_ANY, "预先绑定固定设备"," 一次性为所有启用的固定设备绑定 / 添加 usbipd 策略")
+        self.Bind(wx.EVT_MENU, bg_af(self.prepare_pinned_devices), prepare_menu)
         udev_menu = self.filemenu.Append(wx.ID_ANY, "Udev: 允许所有设备"," 为所有设备添加 udev 用户权限规则")
         self.Bind(wx.EVT_MENU, bg_af(self.udev_permissive_all), udev_menu)
         self.filemenu.AppendSeparator()
@@ -199,6 +346,8 @@ class WslUsbGui(wx.Frame):
         # Intercept window close.
         self.Bind(wx.EVT_CLOSE, self.OnClose)
 
+        self.highlighter = HighlightAnimator(self)
+
         splitter_bottom = ProportionalSplitter(self, proportion=0.66, style=wx.SP_LIVE_UPDATE)
         splitter_top = ProportionalSplitter(
             splitter_bottom, proportion=0.33, style=wx.SP_LIVE_UPDATE
@@ -231,26 +380,21 @@ class WslUsbGui(wx.Frame):
         top_controls.AddSpacer(6)
         top_controls.Add(refresh_button, 1, wx.TOP, border=6)
 
-        self.available_listbox = ListCtrl(top_panel, type=Device)
+        self.available_listbox = ListCtrl(
+            top_panel, type=Device, sort_key=lambda d: d.BusId, highlighter=self.highlighter
+        )
         self.available_listbox.InsertColumns(DEVICE_COLUMNS)
 
         async def available_menu(event):
-            x, y = event.GetX(), event.GetY()
             popupmenu = wx.Menu()
-            device = self.get_selected_device(verbose=False)
-            clicked_on_background = False
-            if device:
-                item = self.available_listbox.GetFirstSelected()
-                _mainWin: UltimateListMainWindow = self.available_listbox._mainWin
-                x, y = _mainWin.CalcUnscrolledPosition(x, y)
-                if _mainWin.InReportView():
-                    if not _mainWin.HasAGWFlag(ULC_HAS_VARIABLE_ROW_HEIGHT):
-                        current = y // _mainWin.GetLineHeight()
-                        if current != item:
-                            # clicked on background
-                            clicked_on_background = True
-
-            if not device or clicked_on_background:
+            row = self.available_listbox.RowAt(event.GetItem())
+            if row != -1:
+                # Menu entries act on the selection
+                self.available_listbox.Select(row)
+                self.deselect_other_treeviews(treeview=self.available_listbox)
+            device = self.get_selected_device(verbose=False) if row != -1 else None
+
+            if not device:
                 if self.show_hidden:
                     entries = [
                         ("隐藏已屏蔽设备", self.mask_hidden_devices,),
@@ -276,6 +420,11 @@ class WslUsbGui(wx.Frame):
                         ("强制绑定", bg_af(self.force_bind)),
                         ("解除绑定", bg_af(self.unbind)),
                     ])
+                backoff = self.attach_backoff.get(device.InstanceId)
+                if backoff and backoff.state != "closed":
+                    entries.extend([
+                        ("立即重试自动附加", bg_af(self.retry_auto_attach)),
+                    ])
                 if device.InstanceId not in self.hidden_devices:
                     entries.extend([
                         ("隐藏", self.hide_device),
@@ -294,13 +443,13 @@ class WslUsbGui(wx.Frame):
             # Show menu
             self.PopupMenu(popupmenu)
 
-        wxasync.AsyncBind(wx.EVT_RIGHT_UP, available_menu, self.available_listbox)
+        wxasync.AsyncBind(wx.dataview.EVT_DATAVIEW_ITEM_CONTEXT_MENU, available_menu, self.available_listbox)
 
         async def available_checked(event):
             available_listbox = event.EventObject
             device: Device = available_listbox.devices[event.Index]
-            bound = available_listbox.GetItem(event.Index, col=2).IsChecked()
-            forced = available_listbox.GetItem(event.Index, col=3).IsChecked()
+            bound = available_listbox.IsChecked(event.Index, 2)
+            forced = available_listbox.IsChecked(event.Index, 3)
             if device.forced and not forced:
                 await self.unbind_bus_id(device.BusId)
             elif forced and not device.forced:
@@ -339,10 +488,17 @@ class WslUsbGui(wx.Frame):
         middle_controls.Add(auto_attach_button, 1, wx.TOP, border=6)
         middle_controls.Add(rename_button, 1, wx.TOP, border=6)
 
-        self.attached_listbox = ListCtrl(middle_panel, type=Device)
+        self.attached_listbox = ListCtrl(
+            middle_panel, type=Device, sort_key=lambda d: d.BusId, highlighter=self.highlighter
+        )
         self.attached_listbox.InsertColumns(ATTACHED_COLUMNS)
 
         async def attached_menu(event):
+            row = self.attached_listbox.RowAt(event.GetItem())
+            if row == -1:
+                return
+            self.attached_listbox.Select(row)
+            self.deselect_other_treeviews(treeview=self.attached_listbox)
             popupmenu = wx.Menu()
             entries = [
                 ("分离设备", bg_af(self.detach_wsl)),
@@ -357,13 +513,13 @@ class WslUsbGui(wx.Frame):
             # Show menu
             self.PopupMenu(popupmenu)
 
-        wxasync.AsyncBind(wx.EVT_LIST_ITEM_RIGHT_CLICK, attached_menu, self.attached_listbox)
+        wxasync.AsyncBind(wx.dataview.EVT_DATAVIEW_ITEM_CONTEXT_MENU, attached_menu, self.attached_listbox)
 
 
         async def attached_checked(event):
             attached_listbox = event.EventObject
             device: Device = attached_listbox.devices[event.Index]
-            forced = attached_listbox.GetItem(event.Index, col=2).IsChecked()
+            forced = attached_listbox.IsChecked(event.Index, 2)
             if device.forced and not forced:
                 await self.unbind_bus_id(device.BusId)
             elif forced and not device.forced:
@@ -400,7 +556,11 @@ class WslUsbGui(wx.Frame):
         bottom_controls.Add(pinned_list_edit_button, 1, wx.TOP, border=6)
         bottom_controls.Add(pinned_list_delete_button, 1, wx.TOP, border=6)
 
-        self.pinned_listbox = ListCtrl(bottom_panel, type=Profile)
+        self.pinned_listbox = ListCtrl(
+            # Rows are display copies, keyed by the stored profile they show (see update_pinned_listbox)
+            bottom_panel, type=Profile, key=lambda p: id(p.profile),
+            highlighter=self.highlighter,
+        )
         self.pinned_listbox.InsertColumns(PROFILES_COLUMNS)
 
         def profile_menu(event):
@@ -416,19 +576,26 @@ class WslUsbGui(wx.Frame):
             self.PopupMenu(popupmenu)  # , position)
 
         def _profile_menu(event):
+            row = self.pinned_listbox.RowAt(event.GetItem())
+            if row == -1:
+                return
+            self.pinned_listbox.Select(row)
+            self.deselect_other_treeviews(treeview=self.pinned_listbox)
             wx.CallAfter(profile_menu, event)
 
-        self.pinned_listbox.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, _profile_menu)
+        self.pinned_listbox.Bind(wx.dataview.EVT_DATAVIEW_ITEM_CONTEXT_MENU, _profile_menu)
 
         async def profile_checked(event):
             pinned_listbox = event.EventObject
             # print(f"aaaaaaa: {pinned_listbox.__dict__=}")
             # await asyncio.sleep(0.1)  # Ensure the event is processed after the item is checked
-            profile: Profile = pinned_listbox.devices[event.Index]
-            enabled = pinned_listbox.GetItem(event.Index, col=2).IsChecked()
+            profile: Profile = pinned_listbox.devices[event.Index].profile
+            enabled = pinned_listbox.IsChecked(event.Index, 2)
             if profile.enabled != enabled:
                 profile.enabled = enabled
                 self.save_config()
+                self.update_keep_warm()
+                self.update_auto_attach()
                 self.refresh(delay=1.0)
             return True
 
@@ -441,15 +608,15 @@ class WslUsbGui(wx.Frame):
 
         # Ensure only one device can be selected at a time
         self.available_listbox.Bind(
-            wx.EVT_LIST_ITEM_SELECTED,
+            wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED,
             partial(self.deselect_other_treeviews, treeview=self.available_listbox),
         )
         self.attached_listbox.Bind(
-            wx.EVT_LIST_ITEM_SELECTED,
+            wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED,
             partial(self.deselect_other_treeviews, treeview=self.attached_listbox),
         )
         self.pinned_listbox.Bind(
-            wx.EVT_LIST_ITEM_SELECTED,
+            wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED,
             partial(self.deselect_other_treeviews, treeview=self.pinned_listbox),
         )
 
@@ -527,6 +694,7 @@ class WslUsbGui(wx.Frame):
         os.startfile(APP_DIR)
 
     def _go_to_about(self, _event):
+        import webbrowser
         webbrowser.open_new("https://gitlab.com/alelec/wsl-usb-gui")
 
     @staticmethod
@@ -538,6 +706,7 @@ class WslUsbGui(wx.Frame):
         settings_window.ShowModal()
 
     def load_config(self):
+        self._profile_matcher = None
         try:
             log.info(f"Loading config from: {CONFIG_FILE}")
             config = json.loads(CONFIG_FILE.read_text())
@@ -546,26 +715,34 @@ class WslUsbGui(wx.Frame):
             else:
                 self.pinned_profiles = [self.create_profile(*c) for c in config["pinned_profiles"]]
                 self.name_mapping = config["name_mapping"]
-                self.hidden_devices = config.get("hidden_devices", [])
+                self.hidden_devices = set(config.get("hidden_devices", []))
                 self.informed_about_tray = config.get("informed_about_tray", False)
                 self.first_run = config.get("first_run", True)
                 self.auto_start_at_boot = config.get("auto_start_at_boot", self.auto_start_at_boot)
                 self.close_to_tray = config.get("close_to_tray", self.close_to_tray)
                 self.notify_on_new_device = config.get("notify_on_new_device", self.notify_on_new_device)
+                self.keep_wsl_warm = config.get("keep_wsl_warm", self.keep_wsl_warm)
+                self.usbipd_auto_attach = config.get("usbipd_auto_attach", self.usbipd_auto_attach)
+                self.prepare_pinned_at_start = config.get("prepare_pinned_at_start", self.prepare_pinned_at_start)
 
         except Exception as ex:
             pass
 
     def save_config(self):
+        # Profiles are always saved after being changed
+        self._profile_matcher = None
         config = dict(
             pinned_profiles=[astuple(p) for p in self.pinned_profiles],
             name_mapping=self.name_mapping,
-            hidden_devices=self.hidden_devices,
+            hidden_devices=sorted(self.hidden_devices),
             informed_about_tray=self.informed_about_tray,
             first_run=__version__,
             auto_start_at_boot=self.auto_start_at_boot,
             close_to_tray=self.close_to_tray,
             notify_on_new_device=self.notify_on_new_device,
+            keep_wsl_warm=self.keep_wsl_warm,
+            usbipd_auto_attach=self.usbipd_auto_attach,
+            prepare_pinned_at_start=self.prepare_pinned_at_start,
 
         )
         CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -606,7 +783,7 @@ class WslUsbGui(wx.Frame):
                 rows.append(Device(str(bus_info), description, bind, forced, instanceId, attached, orig_description))
         return rows
 
-    def deselect_other_treeviews(self, *args, treeview: UltimateListCtrl):
+    def deselect_other_treeviews(self, *args, treeview: "ListCtrl"):
         if not treeview.GetSelectedItemCount():
             return
 
@@ -617,8 +794,8 @@ class WslUsbGui(wx.Frame):
         ):
             if tv is treeview:
                 continue
-            while (i := tv.GetFirstSelected()) != -1:
-                tv.Select(i, on=False)
+            if tv.GetFirstSelected() != -1:
+                tv.UnselectAll()
 
     async def list_wsl_usb(self) -> List[Device]:
         try:
@@ -632,11 +809,46 @@ class WslUsbGui(wx.Frame):
                 log.exception("list_wsl_usb")
             return []
 
+    async def wait_for_device_state(self, bus_id, state, timeout=10.0) -> bool:
+        """
+        Poll usbipd state until the device on bus_id reaches the expected state
+        (one of DEVICE_STATES), backing off between polls.
+        Returns False if the timeout expires first.
+        """
+        expected = DEVICE_STATES[state]
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        interval = 0.1
+        while True:
+            devices = await self.list_wsl_usb()
+            device = next((d for d in devices if d.BusId == bus_id), None)
+            if expected(device):
+                log.info(f"{bus_id} {state} ({loop.time() - start:.2f}s)")
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                log.warning(f"Timeout waiting for {bus_id} to be {state}")
+                return False
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, 1.0)
+
     @staticmethod
     async def usbipd_run_admin_if_needed(command, msg=None):
-        result = await run(command)
-        stderr = result.stderr.lower()
-        if "error:" in stderr and "administrator" in stderr:
+        op = " ".join(str(arg) for arg in command[1:] if not str(arg).startswith("-"))
+        if elevation.required(op):
+            # Known to fail unelevated, skip straight to the elevated run.
+            needs_admin = True
+        else:
+            result = await run(command)
+            stderr = result.stderr.lower()
+            needs_admin = "error:" in stderr and "administrator" in stderr
+            if needs_admin:
+                elevation.learn(op, True)
+            elif not result.returncode:
+                elevation.learn(op, False)
+
+        if needs_admin and not elevation.is_elevated():
             if msg:
                 wx.MessageBox(
                     caption="管理员权限",
@@ -652,6 +864,11 @@ class WslUsbGui(wx.Frame):
         return result
 
     async def bind_bus_id(self, bus_id, forced, msg=None):
+        return await self.device_ops.submit(
+            bus_id, ("bind", forced), partial(self._bind_bus_id, bus_id, forced, msg)
+        )
+
+    async def _bind_bus_id(self, bus_id, forced, msg=None):
         command = [USBIPD, "bind", f"--busid={bus_id}"]
         if forced:
             command.append("--force")
@@ -661,10 +878,18 @@ class WslUsbGui(wx.Frame):
         if result.stderr:
             log.error(result.stderr)
         log.info(f"Bind {bus_id}: {'成功' if not result.returncode else '失败'}")
-        self.refresh(delay=1.0)
+        if not result.returncode:
+            # An elevated bind returns before it has completed, wait for usbipd to report it.
+            await self.wait_for_device_state(bus_id, "bound")
+        self.refresh()
         return result
 
     async def unbind_bus_id(self, bus_id):
+        return await self.device_ops.submit(
+            bus_id, ("unbind",), partial(self._unbind_bus_id, bus_id)
+        )
+
+    async def _unbind_bus_id(self, bus_id):
         command = [USBIPD, "unbind", f"--busid={bus_id}"]
         result = await WslUsbGui.usbipd_run_admin_if_needed(command)
         if result.stdout:
@@ -672,27 +897,39 @@ class WslUsbGui(wx.Frame):
         if result.stderr:
             log.error(result.stderr)
         log.info(f"Unbind {bus_id}: {'成功' if not result.returncode else '失败'}")
-        self.refresh(delay=1.0)
+        if not result.returncode:
+            await self.wait_for_device_state(bus_id, "unbound")
+        self.refresh()
         return result
 
     async def attach_wsl_usb(self, device: Device):
+        return await self.device_ops.submit(
+            device.BusId, ("attach",), partial(self._attach_wsl_usb, device)
+        )
+
+    async def _attach_wsl_usb(self, device: Device):
         msg = (
             "首次将设备附加到 WSL 需要提升权限；" + 
             "后续附加使用标准用户权限。"
         )
-        if not device.bound:
-            result = await self.bind_bus_id(device.BusId, forced=False, msg=msg)
-            await asyncio.sleep(3)
+        if not device.bound and not await self.autobind_covers(device):
+            result = await self._bind_bus_id(device.BusId, forced=False, msg=msg)
             msg = None
 
-        result = None
-        if USBIPD_VERSION < (4, 0, 0):
-            command = [USBIPD, "wsl", "attach", "--busid=" + device.BusId]
-            result = await WslUsbGui.usbipd_run_admin_if_needed(command, msg)
+        # Usually finished in the background long before the first attach, never waited for here
+        self.check_wsl_ready()
+        ready = self.expect_wsl_ready(device)
 
-        if result is None or (result.returncode != 0):
-            command = [USBIPD, "attach", "--wsl", "--busid=" + device.BusId]
+        for command in usbipd_wsl_commands("attach", device.BusId):
             result = await WslUsbGui.usbipd_run_admin_if_needed(command, msg)
+            if result.returncode == 0:
+                break
+
+        if ready is not None:
+            if result.returncode == 0:
+                asyncio.create_task(self.report_wsl_ready(device, ready))
+            else:
+                ready.cancel()
 
         status = f"已附加: {device.Description}"
         if result.stdout:
@@ -710,6 +947,12 @@ class WslUsbGui(wx.Frame):
                         status = "客户端未正确安装，正在安装依赖项..."
                         log.warning(status)
                         install_deps()
+                        self.check_wsl_ready(force=True)
+
+                    elif any(e in stderr_lower_line for e in WSL_CLIENT_ERRORS):
+                        # WSL side isn't ready, eg. udev stopped or vhci-hcd unloaded
+                        status = stderr_line
+                        self.check_wsl_ready(force=True)
 
                     elif "is already attached to a client." in stderr_lower_line:
                         # Not an error, we've just tried to attach twice.
@@ -725,21 +968,91 @@ class WslUsbGui(wx.Frame):
         self.SetStatusText("  " + status)
         return result
 
+    def expect_wsl_ready(self, device: Device) -> Optional[asyncio.Future]:
+        """
+        Start watching for the device's nodes to be created in WSL, must be called before attaching.
+        None if the udev monitor isn't running (yet), it's then started for later attaches.
+        """
+        if not self.udev_monitor.running:
+            self.start_udev_monitor()
+            return None
+        try:
+            vid, pid, serial = self.device_ident(device)
+            return self.udev_monitor.expect(vid, pid, self.device_serial(serial))
+        except Exception as ex:
+            log.warning(f"Can't monitor WSL readiness of {device.BusId}: {ex}")
+            return None
+
+    def udev_monitor_wanted(self) -> bool:
+        # The monitor's wsl process holds the VM open, so it only runs while the VM
+        # is being kept anyway: keep warm is on, or a device is attached.
+        return self.keep_warm.enabled or any(d.Attached for d in self.usb_devices)
+
+    def update_udev_monitor(self):
+        """
+        Start or stop the udev monitor, see udev_monitor_wanted().
+        """
+        if not self.udev_monitor_wanted():
+            if self.udev_monitor_start is not None:
+                self.udev_monitor_start.cancel()
+                self.udev_monitor_start = None
+            if self.udev_monitor.running:
+                log.info("Stopping udev monitor, WSL no longer needed")
+                asyncio.create_task(self.udev_monitor.close())
+            return
+        if self.wsl_ready is None:
+            # Starts the monitor once udev is known to be running
+            self.check_wsl_ready()
+        elif self.wsl_ready.done() and self.wsl_ready.result().get("udev"):
+            self.start_udev_monitor()
+
+    def start_udev_monitor(self):
+        """
+        Start the udev monitor in the background, unless already running / starting.
+        """
+        if self.udev_monitor.running:
+            return
+        if self.udev_monitor_start is None or self.udev_monitor_start.done():
+            self.udev_monitor_start = asyncio.create_task(self._start_udev_monitor())
+
+    async def _start_udev_monitor(self):
+        try:
+            await self.udev_monitor.start()
+        except Exception as ex:
+            log.warning(f"Could not start udev monitor: {ex}")
+
+    async def report_wsl_ready(self, device: Device, ready: asyncio.Future):
+        try:
+            elapsed, devname = await asyncio.wait_for(ready, 30)
+        except asyncio.TimeoutError:
+            log.warning(f"{device.BusId} {device.Description}: no device node appeared in WSL")
+            return
+        self.SetStatusText(f"  WSL 设备已就绪: {device.Description} {devname} ({elapsed:.2f}s)")
+        # Only the ready time shown in its row has changed
+        device.Status = self.attached_status(device)
+        self.attached_listbox.Update(device)
+
+    async def detach_wsl_usb(self, bus_id):
+        return await self.device_ops.submit(
+            bus_id, ("detach",), partial(self._detach_wsl_usb, bus_id)
+        )
+
     @staticmethod
-    async def detach_wsl_usb(bus_id):
-        result = None
-        if USBIPD_VERSION < (4, 0, 0):
-            result = await run([USBIPD, "wsl", "detach", "--busid=" + str(bus_id)])
-        if not result or (result.returncode != 0):
-            result = await run([USBIPD, "detach", "--busid=" + str(bus_id)])
+    async def _detach_wsl_usb(bus_id):
+        for command in usbipd_wsl_commands("detach", bus_id):
+            result = await run(command)
+            if result.returncode == 0:
+                break
 
         if result.stdout:
             log.info(result.stdout)
         if result.stderr:
             log.error(result.stderr)
+        return result
 
     def update_pinned_listbox(self, focus=None):
-        self.pinned_listbox.DeleteAllItems()
+        display_profiles = []
+        highlight = set()
         for profile in self.pinned_profiles:
             display_profile = Profile(
                 BusId=profile.BusId,
@@ -747,6 +1060,7 @@ class WslUsbGui(wx.Frame):
                 InstanceId=profile.InstanceId,
                 enabled=profile.enabled
             )
+            display_profile.profile = profile
 
             # If no description, try to look it up or use InstanceId
             if not display_profile.Description:
@@ -756,13 +1070,55 @@ class WslUsbGui(wx.Frame):
                 elif profile.InstanceId:
                     display_profile.Description = f"[{profile.InstanceId}]"
 
-            highlight = focus is not None and profile == focus
-            self.pinned_listbox.Append(display_profile, highlight=highlight)
+            display_profiles.append(display_profile)
+            if profile is focus:
+                highlight.add(self.pinned_listbox.key(display_profile))
+
+        self.pinned_listbox.SetDevices(display_profiles, highlight=highlight)
+
+        self.update_keep_warm()
+        self.update_auto_attach()
+
+    def update_keep_warm(self):
+        self.keep_warm.update(
+            self.keep_wsl_warm and any(p.enabled for p in self.pinned_profiles)
+        )
+        self.update_udev_monitor()
+
+    def update_auto_attach(self):
+        """
+        Supervise a usbipd auto-attach process for each enabled profile pinned to
+        exactly one BusId, other profiles still attach on refresh.
+        """
+        bus_ids = set()
+        # Command syntax depends on the usbipd version, not known until checked at startup
+        if self.usbipd_auto_attach and AutoAttachSupervisor.supported():
+            for profile in self.pinned_profiles:
+                if (
+                    profile.enabled and profile.BusId and not profile.InstanceId
+                    and not profile.BusId.startswith("re:")
+                    and not str(profile.Description).startswith("re:")
+                ):
+                    bus_ids.add(profile.BusId)
+        self.auto_attach.update(bus_ids)
+
+    def auto_attach_changed(self, bus_id: str):
+        # Only the status shown in the device's (available) row depends on the supervisor
+        device = self.usb_devices.by_bus_id.get(bus_id)
+        if device is not None and not device.Attached:
+            device.Status = self.available_status(device)
+            self.available_listbox.Update(device)
 
     # Define a function to implement choice function
     def auto_attach_wsl_choice(self, profile: Profile):
-        self.pinned_profiles.append(profile)
-        self.save_config()
+        fields = lambda p: (p.BusId, p.Description, p.InstanceId)
+        existing = next((p for p in self.pinned_profiles if fields(p) == fields(profile)), None)
+        if existing is not None:
+            log.info(f"Profile already pinned: {fields(profile)}")
+            profile = existing
+        else:
+            self.pinned_profiles.append(profile)
+            self.save_config()
         self.update_pinned_listbox(focus=profile)
 
     def update_pinned_profile(self, instanceid, new_description):
@@ -771,24 +1127,26 @@ class WslUsbGui(wx.Frame):
                 p.Description = new_description
                 self.save_config()
 
-    def remove_pinned_profile(self, busid, description, instanceid):
-        profile = self.create_profile(busid, description, instanceid)
-        for p in list(self.pinned_profiles):
-            if (p.BusId and p.BusId == profile.BusId) or (
-                p.InstanceId and p.InstanceId == profile.InstanceId
-            ):
-                self.pinned_profiles.remove(p)
-                self.save_config()
-
-    def delete_profile(self, event=None):
+    def selected_profile(self) -> Optional[Profile]:
+        """
+        The stored profile shown by the selected row of the pinned listbox.
+        """
         selection = self.pinned_listbox.GetFirstSelected()
         if selection == -1:
+            return None
+        return self.pinned_listbox.devices[selection].profile
+
+    def forget_profile(self, profile: Profile):
+        # By identity, as equal profiles may have been pinned more than once
+        self.pinned_profiles[:] = [p for p in self.pinned_profiles if p is not profile]
+        self.save_config()
+
+    def delete_profile(self, event=None):
+        profile = self.selected_profile()
+        if profile is None:
             log.error("no selection to delete")
             return  # no selected item
-        profile: Profile = self.pinned_listbox.devices[selection]
-        # self.pinned_listbox.DeleteItem(selection)
-        self.remove_pinned_profile(profile.BusId, profile.Description, profile.InstanceId)
-        self.save_config()
+        self.forget_profile(profile)
         self.update_pinned_listbox()
 
     def add_custom_profile_context_menu(self, event):
@@ -797,18 +1155,17 @@ class WslUsbGui(wx.Frame):
             log.error("no selection to create profile for")
             return
         self.add_custom_profile(device.BusId, device.Description, device.InstanceId)
-        self.refresh(delay=3)
+        self.refresh()
 
     def edit_profile(self, event=None):
         """
         Edit a profile from the pinned listbox.
         Opens a dialog to input bus ID, description, and instance ID.
         """
-        selection = self.pinned_listbox.GetFirstSelected()
-        if selection == -1:
+        profile = self.selected_profile()
+        if profile is None:
             log.error("no selection to edit")
             return
-        profile: Profile = self.pinned_listbox.devices[selection]
         dlg = CustomProfileDialog(self, "Edit", profile.BusId, profile.Description, profile.InstanceId)
         if dlg.ShowModal() == wx.ID_OK:
             busid, description, instanceid = dlg.get_values()
@@ -819,7 +1176,7 @@ class WslUsbGui(wx.Frame):
                     wx.OK | wx.ICON_ERROR,
                 )
                 return
-            self.remove_pinned_profile(profile.BusId, profile.Description, profile.InstanceId)
+            self.forget_profile(profile)
             profile = self.create_profile(busid, description, instanceid)
             self.auto_attach_wsl_choice(profile)
         dlg.Destroy()
@@ -863,20 +1220,14 @@ class WslUsbGui(wx.Frame):
                 log.error("No device selected")
             return None
 
-        device = [
-            d
-            for d in self.usb_devices
-            if d.BusId == selection.BusId and d.Description == selection.Description
-        ][0]
-        return device
+        return self.usb_devices.find(selection) or selection
 
     def unhide_device(self, event=None):
         device = self.get_selected_device()
         if not device:
             return
 
-        if device.InstanceId in self.hidden_devices:
-            self.hidden_devices.remove(device.InstanceId)
+        self.hidden_devices.discard(device.InstanceId)
 
         self.save_config()
         self.refresh()
@@ -894,7 +1245,7 @@ class WslUsbGui(wx.Frame):
         if not device:
             return
 
-        self.hidden_devices.append(device.InstanceId)
+        self.hidden_devices.add(device.InstanceId)
 
         self.save_config()
         self.refresh()
@@ -911,62 +1262,80 @@ class WslUsbGui(wx.Frame):
         vid, pid, serial = re.search(r"\\VID_([0-9A-Fa-f]+)&PID_([0-9A-Fa-f]+)\\([&0-9A-Za-z]+)$", device.InstanceId).groups()
         return vid, pid, serial
 
+    @staticmethod
+    def device_hardware_id(device: Device) -> Optional[str]:
+        try:
+            vid, pid, _ = WslUsbGui.device_ident(device)
+        except AttributeError:
+            return None
+        return f"{vid}:{pid}".lower()
+
+    async def autobind_ids(self, reload=False) -> Set[str]:
+        """
+        Hardware ids usbipd binds by itself on attach, without elevation,
+        due to an "Allow AutoBind" policy for any BusId.
+        """
+        if self._autobind_ids is None or reload:
+            ids = set()
+            if "policy" in USBIPD_COMMANDS:
+                result = await run([USBIPD, "policy", "list"])
+                if result.returncode:
+                    log.warning(f"usbipd policy list: {result.stderr}")
+                for policy in parse_usbipd_policies(result.stdout):
+                    if (
+                        policy.get("effect", "").lower() == "allow"
+                        and policy.get("operation", "").lower() == "autobind"
+                        and not policy.get("busid")
+                        and policy.get("hardware-id")
+                    ):
+                        ids.add(policy["hardware-id"].lower())
+            self._autobind_ids = ids
+        return self._autobind_ids
+
+    async def autobind_covers(self, device: Device) -> bool:
+        hardware_id = self.device_hardware_id(device)
+        return hardware_id is not None and hardware_id in await self.autobind_ids()
+
+    @staticmethod
+    def device_serial(serial: str) -> Optional[str]:
+        # Windows generates an instance path (containing "&") for devices without a serial number
+        return None if "&" in serial else serial
+
 
     async def udev_permissive_all(self, event=None):
-        udev_rule = (
-            f'SUBSYSTEM=="usb|hidraw",MODE="0666"\n'
-            f'SUBSYSTEM=="tty",MODE="0666"'
-        )
-        rules_file = "/etc/udev/rules.d/99-wsl-usb-gui.rules"
-        await run([
-            "wsl", "--user", "root", "sh", "-c",
-            f"echo '{udev_rule}' >> {rules_file}; sudo udevadm control --reload-rules; sudo udevadm trigger",
-        ])
-        log.info(f"udev all rule added: {udev_rule}")
+        udev_rules = [
+            f'SUBSYSTEM=="usb|hidraw",MODE="0666"',
+            f'SUBSYSTEM=="tty",MODE="0666"',
+        ]
+        try:
+            rules = await self.udev_rules.get()
+            for rule in udev_rules:
+                rules.add_rule(rule)
+            await self.udev_rules.save(rules)
+        except OSError as ex:
+            log.error(f"无法保存 udev 规则: {ex}")
+            wx.MessageBox(
+                caption="WSL: 授予用户权限",
+                message=f"错误：添加 udev 规则失败。",
+                style=wx.OK | wx.ICON_WARNING,
+            )
+            return
+        log.info(f"udev all rule added: {udev_rules}")
         wx.MessageBox(
             caption="WSL: 授予用户权限",
             message=f"已为所有 USB 设备添加 WSL udev 用户权限规则",
             style=wx.OK | wx.ICON_INFORMATION,
         )
 
-    async def get_existing_udev_rules(self, vid, pid, serial):
+    async def get_existing_udev_rules(self, vid, pid, serial) -> Optional[DeviceRuleSettings]:
         """Parse existing udev rules for this device to get current permissions and RUN command"""
-        rules_file = "/etc/udev/rules.d/99-wsl-usb-gui.rules"
-
         try:
-            result = await run([
-                "wsl", "--user", "root", "sh", "-c",
-                f"cat {rules_file} 2>/dev/null || echo ''"
-            ])
-
-            if result.returncode != 0:
-                return None, None
-
-            rules_content = result.stdout
-
-            # Look for rules matching this device
-            import re
-            pattern = rf'ATTRS\{{idVendor\}}=="{vid}".*ATTRS\{{idProduct\}}=="{pid}".*ENV\{{ID_SERIAL_SHORT\}}=="{serial}"'
-
-            permissions_enabled = False
-            run_command = None
-
-            for line in rules_content.split('\n'):
-                if re.search(pattern, line):
-                    # Check if this line has MODE="0666" (permissions)
-                    if 'MODE="0666"' in line:
-                        permissions_enabled = True
-
-                    # Check if this line has RUN command
-                    run_match = re.search(r'RUN\+="([^"]+)"', line)
-                    if run_match:
-                        run_command = run_match.group(1)
-
-            return permissions_enabled, run_command
+            rules = await self.udev_rules.get()
+            return rules.settings(vid, pid, serial)
 
         except Exception as ex:
             log.error(f"无法读取现有 udev 规则: {ex}")
-            return None, None
+            return None
 
     async def udev_permissive(self, event=None):
         device = self.get_selected_device()
@@ -979,25 +1348,21 @@ class WslUsbGui(wx.Frame):
             # VID and PID must be hex/lowercase. serial on the otherhand must not be converted to lowercase, but copied verbatim.
             vid = vid.lower()
             pid = pid.lower()
-            udev_rule_match = f'/SUBSYSTEM=="usb.*ATTRS{{idVendor}}=="{vid}".*ATTRS{{idProduct}}=="{pid}".*ENV{{ID_SERIAL_SHORT}}=="{serial}"/d'
-            udev_rule = (
-                f'SUBSYSTEM=="usb|hidraw",ATTRS{{idVendor}}=="{vid}",ATTRS{{idProduct}}=="{pid}",ENV{{ID_SERIAL_SHORT}}=="{serial}",MODE="0666",SYMLINK+="usb/{name}"\n'
-                f'SUBSYSTEM=="tty",ATTRS{{idVendor}}=="{vid}",ATTRS{{idProduct}}=="{pid}",ENV{{ID_SERIAL_SHORT}}=="{serial}",MODE="0666",SYMLINK+="tty/{name}"'
-            )
-            rules_file = "/etc/udev/rules.d/99-wsl-usb-gui.rules"
-            await run([
-                "wsl", "--user", "root", "sh", "-c",
-                f"sed -i '{udev_rule_match}' {rules_file}; echo '{udev_rule}' >> {rules_file}; sudo udevadm control --reload-rules; sudo udevadm trigger",
-            ])
-            # log.info(udev_settings)
-            log.info(f"已添加 udev 规则: {udev_rule}")
+            rules = await self.udev_rules.get()
+            # Keep any other settings (eg. on connect command) already configured for the device
+            settings = rules.settings(vid, pid, serial)
+            settings.permissions = True
+            rules.set_device(vid, pid, serial, name, settings)
+            await self.udev_rules.save(rules)
+            self.refresh()
+            log.info(f"已添加 udev 规则: {rules.device_lines(vid, pid, serial)}")
             wx.MessageBox(
                 caption="WSL: 授予用户权限",
                 message=f"已为 VID:{vid} PID:{pid} 添加 WSL udev 用户权限规则。",
                 style=wx.OK | wx.ICON_INFORMATION,
             )
 
-        except AttributeError as ex:
+        except (AttributeError, OSError) as ex:
             log.error(f"无法获取 udev 的设备信息: {ex}")
             wx.MessageBox(
                 caption="WSL: 授予用户权限",
@@ -1005,6 +1370,48 @@ class WslUsbGui(wx.Frame):
                 style=wx.OK | wx.ICON_WARNING,
             )
 
+    async def load_udev_rules(self):
+        try:
+            await self.udev_rules.get()
+            self.refresh()
+        except Exception as ex:
+            log.error(f"无法读取现有 udev 规则: {ex}")
+
+    def attached_status(self, device: Device) -> str:
+        """
+        Summary of the WSL side state of an attached device: whether it has udev
+        rules / tuning (from the cached rules index) and how long it took to be ready.
+        """
+        try:
+            vid, pid, serial = self.device_ident(device)
+        except AttributeError:
+            return ""
+        labels = []
+        if self.udev_rules.loaded:
+            settings = self.udev_rules.settings(vid.lower(), pid.lower(), serial)
+            if settings:
+                labels.append("udev")
+                labels.extend(settings.tuning())
+        elif not self.udev_rules_requested:
+            self.udev_rules_requested = True
+            asyncio.create_task(self.load_udev_rules())
+        if device.BusId in self.auto_attach.bus_ids:
+            labels.append("自动附加")
+        ready_time = self.udev_monitor.ready_time(vid, pid, self.device_serial(serial))
+        if ready_time is not None:
+            labels.append(f"就绪 {ready_time:.1f}s")
+        return ", ".join(labels)
+
+    async def set_usbfs_memory(self, size_mb: Optional[int]):
+        try:
+            rules = await self.udev_rules.get()
+            rules.set_usbfs_memory(size_mb)
+            await self.udev_rules.save(rules)
+            log.info(f"usbfs memory limit: {size_mb or 'default'}")
+        except Exception as ex:
+            log.error(f"无法设置 usbfs 内存上限: {ex}")
+            wx.MessageBox("错误：设置 usbfs 内存上限失败。", "错误", wx.OK | wx.ICON_ERROR)
+
     def udev_on_connect_command(self, event=None):
         device = self.get_selected_device()
         if not device:
@@ -1021,115 +1428,158 @@ class WslUsbGui(wx.Frame):
         if re.match(r"USB Serial Device \(COM\d+\)", name):
             return True
 
-    async def refresh_task(self, delay: float = 0):
+    async def refresh_task(self):
+        """
+        Refresh the device lists, only ever run by self.refresh_scheduler.
+        """
         try:
-            if self.refreshing_delay:
-                # There's another refresh about to start
-                return
-            if delay:
-                self.refreshing_delay = True
-                await asyncio.sleep(delay)
-                self.refreshing_delay = False
-
-            if self.refreshing:
-                # Busy right now, might have missed the trigger though to re-run soon
-                asyncio.create_task(self.refresh_task(delay=5))
-                return
-
-            self.refreshing = True
             self.busy_icon.Show()
             self.busy_icon.Play()
 
             log.info("刷新 USB")
 
-            task = asyncio.create_task(self.list_wsl_usb())
+            # The windows enumerations block, run them in threads alongside usbipd
+            loop = asyncio.get_running_loop()
+            timings: Dict[str, float] = {}
 
-            comports = {}
-            for c in serial.tools.list_ports.comports():
-                if getattr(c, "vid", None) and getattr(c, "pid", None):
-                    comports[str((f"{c.vid:04X}", f"{c.pid:04X}", c.serial_number.upper()))] = c.name
-                await asyncio.sleep(0.01)
-
-            try:
-                raw_devices, tree = InspectUsbDevices()
-            except:
-                log.exception("Failures in InspectUsbDevices")
-                raw_devices = {}
+            async def timed(stage, awaitable):
+                start = time.perf_counter()
+                try:
+                    return await awaitable
+                finally:
+                    timings[stage] = time.perf_counter() - start
 
-            usb_devices = await task
+            usb_devices, raw_devices = await asyncio.gather(
+                timed("usbipd", self.list_wsl_usb()),
+                timed("inspect", loop.run_in_executor(None, inspect_usb_devices)),
+            )
+            self.raw_devices = raw_devices
 
             new_devices = []
             if self.usb_devices:
                 # Don't report new device on first run at startup.
                 new_devices = set(usb_devices) - set(self.usb_devices)
 
-            self.usb_devices = usb_devices
+            self.usb_devices = DeviceRegistry(usb_devices)
+            self.update_udev_monitor()
 
-            self.attached_listbox.DeleteAllItems()
-            self.available_listbox.DeleteAllItems()
+            self.attached_listbox.model_time = 0.0
+            self.available_listbox.model_time = 0.0
 
-            if not self.usb_devices:
-                return
-
-            tasks = []
+            # First place every device in its list as things stand, then try
+            # auto-attaching, moving the ones which succeed.
+            attached = []
+            available = []
+            highlight = set()
+            shade = set()
+            candidates = []
             for device in sorted(self.usb_devices, key=lambda d: d.BusId):
+                key = self.available_listbox.key(device)
                 if device.InstanceId in self.hidden_devices:
                     if self.show_hidden:
-                        self.available_listbox.Append(device, shade=True)
+                        available.append(device)
+                        shade.add(key)
                     continue
 
+                details = raw_devices.get(device.InstanceId)
                 if self.generic_device_name(device.Description):
                     if device.InstanceId not in self.name_mapping:
-                        if details := raw_devices.get(device.InstanceId):
-                            if details.Manufacturer and details.Product:
-                                device.OrigDescription = device.Description
-                                device.Description = f"{details.Manufacturer.strip()} {details.Product.strip()}"
+                        if details and details.Manufacturer and details.Product:
+                            device.OrigDescription = device.Description
+                            device.Description = f"{details.Manufacturer.strip()} {details.Product.strip()}"
 
-                try:
-                    devid = str(self.device_ident(device)).upper()  # (vid, pid, sernum)
-                    if str(devid) in comports:
-                        windows_com_port = comports[str(devid)]
-                        if windows_com_port not in device.Description:
-                            device.Description = re.sub(r" ?\(COM\d+\) ?", "", device.Description)
-                            device.Description += f" ({windows_com_port})"
-                except:
-                    pass
+                if details and details.PortName:
+                    # Compare whole "(COMn)" tokens, COM1 is not COM10. A stale one
+                    # (eg. in a saved name, from before the port was renamed) is replaced.
+                    if re.findall(r"\((COM\d+)\)", device.Description) != [details.PortName]:
+                        device.Description = re.sub(r" ?\(COM\d+\)", "", device.Description)
+                        device.Description += f" ({details.PortName})"
 
                 new = device in new_devices
                 if device.Attached:
-                    self.attached_listbox.Append(device, highlight=new)
+                    device.Status = self.attached_status(device)
+                    attached.append(device)
+                    if new:
+                        highlight.add(key)
                 else:
-                    task = asyncio.create_task(self.attach_if_pinned(device, highlight=new))
-                    tasks.append(task)
+                    device.Status = self.available_status(device)
+                    available.append(device)
+                    if self.profile_matcher.match(device):
+                        candidates.append((device, new))
+                    elif new:
+                        highlight.add(key)
+
+            self.attached_listbox.SetDevices(attached, highlight=highlight)
+            self.available_listbox.SetDevices(available, highlight=highlight, shade=shade)
 
             if new_devices and self.notify_on_new_device and not self.window_is_focussed():
                 self.RequestUserAttention()
-            await asyncio.gather(*tasks)
+            await asyncio.gather(*(
+                self.attach_if_pinned(device, highlight=new) for device, new in candidates
+            ))
+            rows = self.available_listbox.GetItemCount() + self.attached_listbox.GetItemCount()
+            timings["list model"] = self.available_listbox.model_time + self.attached_listbox.model_time
+            log.info(
+                f"Refresh: {rows} rows, "
+                + ", ".join(f"{stage} {t * 1000:.0f}ms" for stage, t in timings.items())
+            )
         finally:
             self.busy_icon.Stop()
             self.busy_icon.Hide()
-            self.refreshing = False
-            self.refreshing_delay = False
 
     def refresh(self, delay=0.0):
         asyncio.get_running_loop().call_soon_threadsafe(
-            asyncio.ensure_future, self.refresh_task(delay)
+            self.refresh_scheduler.trigger, delay
         )
 
-    async def check_wsl_udev(self):
-        # Autostart WSL udev service if needed
-        udev_start = (await run(
-            [
-                "wsl",
-                "--user",
-                "root",
-                "sh",
-                "-c",
-                "pgrep udev || (echo 'starting udev'; service udev restart)",
-            ]
-        )).stdout.strip()
-        udev_start = udev_start.replace("\n", ", ")
-        log.info(f"udev: {udev_start}")
+    def check_wsl_ready(self, force=False) -> "asyncio.Task[Dict[str, bool]]":
+        """
+        Background check of the WSL side prerequisites, the result is cached for the session.
+        Pass force to re-check, eg. after an attach failed on the client side.
+        A check which failed to run at all is repeated on the next call.
+        """
+        if force or self.wsl_ready is None or (
+            self.wsl_ready.done() and not self.wsl_ready.result()
+        ):
+            self.wsl_ready = asyncio.create_task(self._check_wsl_ready())
+        return self.wsl_ready
+
+    async def _check_wsl_ready(self) -> Dict[str, bool]:
+        # Autostart WSL udev service and load the usbip host driver if needed,
+        # everything in one request as the first one may have to boot the VM.
+        start = time.monotonic()
+        try:
+            result = await self.wsl.run(
+                "pgrep udev >/dev/null || { echo 'starting udev' >&2; service udev restart >/dev/null 2>&1; }; "
+                "pgrep udev >/dev/null && echo udev=1 || echo udev=0; "
+                "test -d /sys/module/vhci_hcd || modprobe vhci_hcd 2>/dev/null; "
+                "test -d /sys/module/vhci_hcd && echo vhci_hcd=1 || echo vhci_hcd=0; "
+                "command -v usbip >/dev/null && echo usbip=1 || echo usbip=0"
+            )
+        except Exception as ex:
+            # eg. wsl isn't installed
+            log.warning(f"WSL checks could not run: {ex}")
+            self.SetStatusText(f"  无法检查 WSL: {ex}")
+            return {}
+        checks = {}
+        for line in result.stdout.split():
+            key, _, value = line.partition("=")
+            checks[key] = value == "1"
+        log.info(
+            f"WSL checks ({time.monotonic() - start:.2f}s): "
+            + ", ".join(f"{k}={'ok' if v else 'missing'}" for k, v in checks.items())
+            + (f" ({result.stderr.strip()})" if result.stderr.strip() else "")
+        )
+        if result.returncode != 0 or not checks:
+            log.warning(f"WSL checks failed: {result.stderr}")
+            self.SetStatusText(f"  WSL 检查失败: {result.stderr.strip()}")
+        elif not checks.get("usbip") and USBIPD_VERSION < (4, 0, 0):
+            # Newer usbipd releases bring their own client
+            log.warning("usbip client not found in WSL")
+        if checks.get("udev") and self.udev_monitor_wanted():
+            # The VM is up by now, so this doesn't hold up the first attach
+            self.start_udev_monitor()
+        return checks
 
     def lookup_description(self, instanceId):
         if not instanceId:
@@ -1138,73 +1588,141 @@ class WslUsbGui(wx.Frame):
         if instanceId == "None":
             return None
 
-        for device in self.usb_devices:
-            if device.InstanceId == instanceId:
-                return device.Description
+        if device := self.usb_devices.by_instance_id.get(instanceId):
+            return device.Description
+        return None
 
-    def compare_profile_value(self, profileString: str, deviceStr: str) -> bool:
+    @property
+    def profile_matcher(self) -> ProfileMatcher:
         """
-        Compare a profile string with a device string.
-        Handles None values and empty strings.
-        Supports regex patterns prefixed with "re:"
+        The enabled profiles compiled for matching devices, rebuilt once they change.
         """
-        profileString = profileString.strip()
-        deviceStr = deviceStr.strip()
+        if self._profile_matcher is None:
+            self._profile_matcher = ProfileMatcher(p for p in self.pinned_profiles if p.enabled)
+        return self._profile_matcher
 
-        checkIsRegex = profileString.startswith("re:")
-        if checkIsRegex:
-            profileString = profileString[3:]  # Remove 're:' prefix for regex matching
+    def available_status(self, device: Device) -> str:
+        """
+        Auto-attach state of a device which isn't attached.
+        """
+        if device.bound and device.BusId in self.auto_attach.bus_ids:
+            return self.auto_attach.status.get(device.BusId, "")
+        backoff = self.attach_backoff.get(device.InstanceId)
+        if backoff and backoff.state != "closed":
+            return backoff.describe()
+        return ""
 
-            # Check cache for compiled regex
-            if profileString not in self._regex_cache:
+    async def attach_if_pinned(self, device, highlight):
+        """
+        Auto-attach device (already in the available list) if it matches a profile,
+        moving it to the attached list on success.
+        """
+        # Bound devices may be left to the usbipd auto-attach process, unbound ones still need binding
+        supervised = device.bound and device.BusId in self.auto_attach.bus_ids
+        if not supervised and self.profile_matcher.match(device):
+            backoff = self.attach_backoff.setdefault(device.InstanceId, AttachBackoff())
+            if backoff.allow():
                 try:
-                    self._regex_cache[profileString] = re.compile(profileString, re.IGNORECASE)
-                except re.error:
-                    log.error(f"Invalid regex pattern: {profileString}")
-                    return False
+                    for __retry in reversed(range(3)):
+                        ret = await self.attach_wsl_usb(device)
+                        if ret is None:
+                            break  # Dropped by a detach, not a failure
+                        if ret.returncode == 0 or await self.wait_for_device_state(device.BusId, "attached", timeout=0.5):
+                            backoff.success()
+                            self.available_listbox.Remove(device)
+                            device.Status = self.attached_status(device)
+                            self.attached_listbox.Append(device, highlight)
+                            return
+                    else:
+                        delay = backoff.failure()
+                        log.warning(f"Auto-attach {device.BusId} failed {backoff.failures} times, retry in {delay:.1f}s")
+                        asyncio.get_running_loop().call_later(delay, self.refresh)
+                finally:
+                    # A trial without an outcome (dropped, raised or cancelled) mustn't block retries
+                    backoff.release()
+
+        device.Status = self.available_status(device)
+        row = self.available_listbox.Update(device)
+        if highlight and row != -1:
+            self.available_listbox.HighlightRow(device, row)
+
+    async def prepare_pinned_devices(self, event=None):
+        """
+        Make every connected device matching an enabled profile attachable without
+        elevation, in one elevated batch: binding the device, plus an AutoBind policy
+        per hardware id if the installed usbipd supports policies, so that the same
+        devices on other ports can be attached without elevation too.
+        """
+        devices = [
+            d for d in await self.list_wsl_usb()
+            if not d.bound and self.profile_matcher.match(d)
+        ]
+        if not devices:
+            log.info("Prepare pinned devices: nothing to do")
+            return
 
-            regex = self._regex_cache[profileString]
-            return bool(regex.search(deviceStr))
-        return profileString == deviceStr
+        commands = []
+        if "policy" in USBIPD_COMMANDS:
+            existing = await self.autobind_ids(reload=True)
+            hardware_ids = {self.device_hardware_id(d) for d in devices} - existing - {None}
+            for hardware_id in sorted(hardware_ids):
+                commands.append([
+                    USBIPD, "policy", "add", "--effect=Allow",
+                    "--operation=AutoBind", f"--hardware-id={hardware_id}",
+                ])
+        bind_ids = [device.BusId for device in devices]
+        for bus_id in bind_ids:
+            commands.append([USBIPD, "bind", f"--busid={bus_id}"])
 
-    async def attach_if_pinned(self, device, highlight):
-        enabledProfiles = [p for p in self.pinned_profiles if p.enabled]
-        for profile in enabledProfiles:
-            desc = profile.Description
-            if (profile.InstanceId or profile.BusId) and not str(desc).startswith("re:"):
-                # Only fallback to description if no other filter set
-                desc = None
-
-            if profile.BusId and not self.compare_profile_value(profile.BusId, device.BusId):
-                continue
-            if profile.InstanceId and not self.compare_profile_value(profile.InstanceId, device.InstanceId):
-                continue
-            if desc and not self.compare_profile_value(desc, device.Description):
-                continue
-            for __retry in reversed(range(3)):
-                ret = await self.attach_wsl_usb(device)
-                if ret.returncode == 0:
-                    self.attached_listbox.Append(device, highlight)
-                    return
-                await asyncio.sleep(0.5)
-            break
+        log.info(f"Prepare pinned devices: {len(commands)} usbipd commands")
 
-        self.available_listbox.Append(device, highlight=highlight)
+        if elevation.is_elevated():
+            for command in commands:
+                result = await run(command)
+                if result.returncode:
+                    log.error(f"{' '.join(map(str, command[1:]))}: {result.stderr}")
+        else:
+            # One elevation prompt for the whole batch. The commands are passed encoded
+            # (rather than in a script file, which could be modified before it's run
+            # elevated), which also avoids quoting them twice.
+            script = "".join(
+                "& '%s' %s\n" % (str(command[0]).replace("'", "''"), " ".join(map(str, command[1:])))
+                for command in commands
+            )
+            encoded = base64.b64encode(script.encode("utf-16-le")).decode()
+            result = await run(
+                r'''Powershell -Command "& { Start-Process powershell -ArgumentList '-NoProfile','-EncodedCommand','%s' -Verb RunAs -WindowStyle Hidden -Wait } "'''
+                % encoded
+            )
+            if result.returncode:
+                log.error(f"Prepare pinned devices: {result.stderr}")
+
+        if "policy" in USBIPD_COMMANDS:
+            await self.autobind_ids(reload=True)
+        await asyncio.gather(*(self.wait_for_device_state(b, "bound") for b in bind_ids))
+        self.refresh()
+
+    async def retry_auto_attach(self, event=None):
+        device = self.get_selected_device(available=True)
+        if not device:
+            return
+        log.info(f"Retry auto-attach {device.BusId} {device.InstanceId}")
+        self.attach_backoff.pop(device.InstanceId, None)
+        self.refresh()
 
     async def force_bind(self, event=None):
         device = self.get_selected_device(available=True)
         if not device:
             return
         result = await self.bind_bus_id(device.BusId, forced=True)
-        log.info(f"Bind (forced) {device.BusId}: {'成功' if not result.returncode else '失败'}")
-        self.refresh(delay=3)
+        if result is not None:
+            log.info(f"Bind (forced) {device.BusId}: {'成功' if not result.returncode else '失败'}")
 
     async def bind(self, event=None, refresh=True):
         device = self.get_selected_device(available=True)
         if not device:
             return
         result = await self.bind_bus_id(device.BusId, forced=False)
-        self.refresh(delay=3)
         return result
 
     async def unbind(self, event=None):
@@ -1212,15 +1730,19 @@ class WslUsbGui(wx.Frame):
         if not device:
             return
         await self.unbind_bus_id(device.BusId)
-        self.refresh(delay=3)
 
     async def attach_wsl(self, event=None):
         device = self.get_selected_device(available=True)
         if not device:
             return
         result = await self.attach_wsl_usb(device)
+        if result is None:
+            log.info(f"Attach {device.BusId}: 已取消")
+            return
         log.info(f"Attach {device.BusId}: {'成功' if not result.returncode else '失败'}")
-        self.refresh(delay=3)
+        if not result.returncode:
+            await self.wait_for_device_state(device.BusId, "attached")
+        self.refresh()
 
     async def detach_wsl(self, event=None):
         device = self.get_selection(attached=True)
@@ -1231,32 +1753,18 @@ class WslUsbGui(wx.Frame):
 
         # Find and disable matching profiles to prevent auto re-attach
         profiles_disabled = 0
-        for profile in self.pinned_profiles:
-            desc = profile.Description
-            if profile.InstanceId or profile.BusId:
-                # Only fallback to description if no other filter set
-                desc = None
-
-            # Check if this profile matches the device
-            if profile.BusId and not self.compare_profile_value(profile.BusId, device.BusId):
-                continue
-            if profile.InstanceId and not self.compare_profile_value(profile.InstanceId, device.InstanceId):
-                continue
-            if desc and not self.compare_profile_value(desc, device.Description):
-                continue
-
-            # This profile matches - disable it
-            if profile.enabled:
-                profile.enabled = False
-                profiles_disabled += 1
-                log.info(f"Disabled matching profile: BusId={profile.BusId}, Description={profile.Description}, InstanceId={profile.InstanceId}")
+        for profile in self.profile_matcher.matches(device):
+            profile.enabled = False
+            profiles_disabled += 1
+            log.info(f"Disabled matching profile: BusId={profile.BusId}, Description={profile.Description}, InstanceId={profile.InstanceId}")
 
         if profiles_disabled > 0:
             self.save_config()
             self.update_pinned_listbox()
 
         await self.detach_wsl_usb(device.BusId)
-        self.refresh(delay=2)
+        await self.wait_for_device_state(device.BusId, "detached")
+        self.refresh()
 
     def auto_attach_wsl(self, event=None):
         global pop
@@ -1269,7 +1777,7 @@ class WslUsbGui(wx.Frame):
             self, device.BusId, device.Description, device.InstanceId, self.icon
         )
         popup.ShowModal()
-        self.refresh(delay=3)
+        self.refresh()
 
     def raise_window(self):
         if self.IsIconized():
@@ -1282,128 +1790,343 @@ class WslUsbGui(wx.Frame):
         return 0 # Indicate message was handled
 
 
-class ListCtrl(UltimateListCtrl):
-    def __init__(self, parent, *args, type: Type, **kw):
-        UltimateListCtrl.__init__(self, parent, wx.ID_ANY, agwStyle=ULC_REPORT|ULC_NO_SORT_HEADER|ULC_SINGLE_SEL|ULC_NO_ITEM_DRAG)
+class ListModel(wx.dataview.DataViewIndexListModel):
+    """
+    Rows of a ListCtrl, as the display values of each column.
+    Only rows that are visible get rendered by the view.
+    """
+    def __init__(self, ctrl: "ListCtrl"):
+        super().__init__(0)
+        self.ctrl = ctrl
+        self.rows: List[list] = []
+        self.colours: List[Optional[wx.Colour]] = []  # Highlight
+        self.shaded: List[bool] = []
+
+    def GetColumnCount(self):
+        return len(self.ctrl.columns)
+
+    def GetColumnType(self, col):
+        return "string" if col < 2 else "bool"
+
+    def GetValueByRow(self, row, col):
+        return self.rows[row][col]
+
+    def SetValueByRow(self, row, col, value):
+        # Only the checkbox columns are editable
+        self.rows[row][col] = value
+        wx.PostEvent(self.ctrl, ListItemCheckedEvent(
+            self.ctrl.GetId(), EventObject=self.ctrl, Index=row,
+            Column=self.ctrl.columns[col], Checked=bool(value),
+        ))
+        return True
+
+    def GetAttrByRow(self, row, col, attr):
+        colour = self.colours[row]
+        if colour is None:
+            if not self.shaded[row]:
+                return False
+            colour = wx.LIGHT_GREY
+        attr.SetBackgroundColour(colour)
+        return True
+
+
+class HighlightAnimator:
+    """
+    Fades out highlighted rows of all the lists, driven by a single timer.
+
+    A highlight lasts DURATION seconds of the window being shown, so new devices
+    which arrive while it's hidden / minimised are still highlighted once restored.
+    The timer only runs while there are highlights and the window is shown.
+    """
+
+    DURATION = 2.0
+    INTERVAL = 250  # ms
+
+    def __init__(self, window: wx.TopLevelWindow):
+        self.window = window
+        # Remaining seconds and original colour by (list, row key)
+        self.rows: Dict[Tuple["ListCtrl", Hashable], Tuple[float, Optional[wx.Colour]]] = {}
+        self.timer = wx.Timer(window)
+        self._last = 0.0
+        window.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
+        window.Bind(wx.EVT_SHOW, self.OnShow)
+        window.Bind(wx.EVT_ICONIZE, self.OnShow)
+
+    def shown(self) -> bool:
+        return self.window.IsShown() and not self.window.IsIconized()
+
+    def add(self, ctrl: "ListCtrl", key, original: Optional[wx.Colour]):
+        # A row highlighted again keeps its original colour, but starts over
+        if existing := self.rows.get((ctrl, key)):
+            original = existing[1]
+        self.rows[(ctrl, key)] = (self.DURATION, original)
+        self._start()
+
+    def _start(self):
+        if self.rows and not self.timer.IsRunning() and self.shown():
+            self._last = time.monotonic()
+            self.timer.Start(self.INTERVAL)
+
+    def OnShow(self, event):
+        event.Skip()
+        if self.shown():
+            self._start()
+        else:
+            self.timer.Stop()
+
+    def OnTimer(self, event):
+        if not self.shown():
+            self.timer.Stop()
+            return
+        now = time.monotonic()
+        elapsed, self._last = now - self._last, now
+        for (ctrl, key), (remaining, original) in list(self.rows.items()):
+            remaining -= elapsed
+            if remaining > 0:
+                self.rows[(ctrl, key)] = (remaining, original)
+                continue
+            del self.rows[(ctrl, key)]
+            row = ctrl.RowOfKey(key)
+            if row != -1:  # else device has likely been unplugged
+                ctrl.SetItemBackgroundColour(row, original)
+        if not self.rows:
+            self.timer.Stop()
+
+
+class ListCtrl(wx.dataview.DataViewCtrl):
+    """
+    Rows are identified by key(device), such that updates only touch the rows which
+    changed (keeping selection and scroll position). Keys are expected to be unique,
+    a list with repeated keys is rebuilt rather than diffed. If given, sort_key is
+    used to keep Append()ed rows in order.
+    """
+    def __init__(self, parent, *args, type: Type, highlighter: HighlightAnimator, key=None, sort_key=None, **kw):
+        wx.dataview.DataViewCtrl.__init__(
+            self, parent, wx.ID_ANY, style=wx.dataview.DV_SINGLE | wx.dataview.DV_ROW_LINES
+        )
 
         self.devices: List[type] = []
         self.columns = []
-
-    def IsVisible(self):
-        cdc = wx.ClientDC(self)
-        # Check some points inside the widget to determine if
-        # this window is visible at those points
-        widget_size = cdc.Size
-        offset = 16
-        widget_size.DecBy(offset)
-        top_left = self.ClientToScreen((offset, offset))
-        bottom_left = self.ClientToScreen((offset, widget_size.height))
-        bottom_right = self.ClientToScreen(widget_size)
-        tl_visible = wx.FindWindowAtPoint(top_left) is not None
-        bl_visible = wx.FindWindowAtPoint(bottom_left) is not None
-        br_visible = wx.FindWindowAtPoint(bottom_right) is not None
-        return (tl_visible and bl_visible) or (tl_visible and br_visible)
-
-    def HighlightRowReset(self, device, reset):
-        try:
-            row = self.devices.index(device)
-            self.SetItemBackgroundColour(row, reset)
-        except ValueError:
-            pass  # device has likely been unplugged
-
-    def HighlightRowMaintain(self, device, reset):
-        if self.IsVisible():
-            wx.CallLater(2000, self.HighlightRowReset, device, reset)
+        self.key: Callable[[Any], Hashable] = key or (lambda d: (d.BusId, d.InstanceId))
+        self.sort_key = sort_key
+        self.highlighter = highlighter
+        self._rows: Optional[Dict[Hashable, int]] = None  # Row of each key, rebuilt on demand
+        self.model = ListModel(self)
+        self.AssociateModel(self.model)
+        # Time spent updating the model's rows, reset by the owner for each refresh. This
+        # doesn't include rendering, the control repaints the visible rows afterwards.
+        self.model_time = 0.0
+
+        self.Bind(wx.EVT_SIZE, self.OnSize)
+
+    def GetItemCount(self):
+        return len(self.devices)
+
+    def GetFirstSelected(self):
+        item = self.GetSelection()
+        if not item.IsOk():
+            return -1
+        return self.model.GetRow(item)
+
+    def GetSelectedItemCount(self):
+        return self.GetSelectedItemsCount()
+
+    def Select(self, index, on=True):
+        item = self.model.GetItem(index)
+        if on:
+            wx.dataview.DataViewCtrl.Select(self, item)
         else:
-            wx.CallLater(1000, self.HighlightRowMaintain, device, reset)
+            self.Unselect(item)
 
-    def EnsureVisible(self, item):
-        # This can be removed once this is in a release:
-        # https://github.com/wxWidgets/Phoenix/commit/54981636c5679e5fb4247cb5b094a7ae29dc545f
-        try:
-            if item >= self.GetItemCount():
-                item = self.GetItemCount() - 1
-
-            _mainWin: UltimateListMainWindow = self._mainWin
-
-            rect = _mainWin.GetLineRect(item)
-            client_w, client_h = _mainWin.GetClientSize()
-            hLine = _mainWin.GetLineHeight(item)
-            view_y = hLine*self.GetScrollPos(wx.VERTICAL)
-
-            if _mainWin.InReportView():
-                _mainWin.ResetVisibleLinesRange()
-                if not _mainWin.HasAGWFlag(ULC_HAS_VARIABLE_ROW_HEIGHT):
-                    if rect.y < view_y:
-                        _mainWin.Scroll(-1, rect.y/hLine)
-                    if rect.y+rect.height+5 > view_y+client_h:
-                        _mainWin.Scroll(-1, (rect.y+rect.height-client_h+hLine)//hLine)
-                    _mainWin._dirty = True
-        except:
-            pass
+    def RowAt(self, item) -> int:
+        """
+        Row of a DataViewItem (eg. from an event), -1 if not valid (ie. background).
+        """
+        if item is None or not item.IsOk():
+            return -1
+        return self.model.GetRow(item)
+
+    def IsChecked(self, index, col):
+        return bool(self.model.rows[index][col])
+
+    def GetItemBackgroundColour(self, index):
+        return self.model.colours[index]
+
+    def SetItemBackgroundColour(self, index, colour):
+        self.model.colours[index] = colour
+        self.model.RowChanged(index)
+
+    def IndexOf(self, device) -> int:
+        return self.RowOfKey(self.key(device))
+
+    def RowOfKey(self, key) -> int:
+        return self._row_index().get(key, -1)
+
+    def _row_index(self) -> Dict[Hashable, int]:
+        # Inserting / deleting rows shifts the following ones, so the index is
+        # dropped then and rebuilt here on the next lookup.
+        if self._rows is None:
+            self._rows = {}
+            for row, d in enumerate(self.devices):
+                self._rows.setdefault(self.key(d), row)
+        return self._rows
+
+    def EnsureVisible(self, index):
+        if 0 <= index < self.GetItemCount():
+            wx.dataview.DataViewCtrl.EnsureVisible(self, self.model.GetItem(index))
 
     def HighlightRow(self, device, index):
-        original = self.GetItemBackgroundColour(index)
-        self.EnsureVisible(index)  # scroll into view if needed  # needs wx update
+        self.highlighter.add(self, self.key(device), self.GetItemBackgroundColour(index))
+        self.EnsureVisible(index)  # scroll into view if needed
         self.SetItemBackgroundColour(index, wx.YELLOW)
-        if self.IsVisible():
-            wx.CallLater(2000, self.HighlightRowReset, device, original)
-        else:
-            wx.CallLater(1000, self.HighlightRowMaintain, device, original)
 
     def InsertColumns(self, names):
+        self.columns = names
         for i, name in enumerate(names):
-            info = UltimateListItem()
-            info._mask = wx.LIST_MASK_TEXT
-            info._image = []
-            info._format = 0
-            info._kind = 1
-            info._text = name
-            self.InsertColumnInfo(i, info)
-            if i != 1:
-                self.SetColumnWidth(i, self.FromDIP(50))
+            if i < 2:
+                self.AppendTextColumn(name, i, width=self.FromDIP(50))
             else:
-                LIST_AUTOSIZE_FILL = -3
-                self.SetColumnWidth(i, LIST_AUTOSIZE_FILL)
-        self.columns = names
+                # Checkbox column
+                self.AppendToggleColumn(
+                    name, i, mode=wx.dataview.DATAVIEW_CELL_ACTIVATABLE, width=self.FromDIP(50)
+                )
+
+    def OnSize(self, event):
+        # Description column fills the remaining width
+        event.Skip()
+        if self.GetColumnCount() < 2:
+            return
+        others = sum(self.GetColumn(i).GetWidth() for i in range(self.GetColumnCount()) if i != 1)
+        width = self.GetClientSize().width - others - wx.SystemSettings.GetMetric(wx.SYS_VSCROLL_X)
+        self.GetColumn(1).SetWidth(max(self.FromDIP(50), width))
 
     def DeleteAllItems(self):
-        pass
-        UltimateListCtrl.DeleteAllItems(self)
         self.devices.clear()
+        self._rows = None
+        self.model.rows.clear()
+        self.model.colours.clear()
+        self.model.shaded.clear()
+        self.model.Reset(0)
+        self.model_time = 0.0
+
+    def RowValues(self, device) -> list:
+        details = astuple(device)[0 : len(self.columns)]
+        values = [str(details[0] or "---")]
+        for i in range(1, len(details)):
+            if i == 1:
+                text = str(details[i])
+                if status := getattr(device, "Status", None):
+                    text += f" [{status}]"
+                values.append(text)
+            else:
+                # Checkbox column
+                values.append(bool(getattr(device, self.columns[i])))
+        return values
+
+    def _insert(self, row, device, highlight=False, shade=False):
+        self.devices.insert(row, device)
+        self._rows = None
+        self.model.rows.insert(row, self.RowValues(device))
+        self.model.colours.insert(row, None)
+        self.model.shaded.insert(row, shade)
+        self.model.RowInserted(row)
+        if highlight:
+            self.HighlightRow(device, row)
+
+    def _delete(self, row):
+        del self.devices[row]
+        self._rows = None
+        del self.model.rows[row]
+        del self.model.colours[row]
+        del self.model.shaded[row]
+        self.model.RowDeleted(row)
+
+    def _update(self, row, device, shade=False):
+        # Only notify the view of cells which actually changed
+        self.devices[row] = device
+        values = self.RowValues(device)
+        current = self.model.rows[row]
+        for col, value in enumerate(values):
+            if current[col] != value:
+                current[col] = value
+                self.model.RowValueChanged(row, col)
+        if self.model.shaded[row] != shade:
+            self.model.shaded[row] = shade
+            self.model.RowChanged(row)
+
+    def SetDevices(self, devices, highlight=(), shade=()):
+        """
+        Reconcile the rows with devices (in this order): inserting new rows, removing
+        missing ones and updating changed cells. highlight / shade are sets of keys.
+        """
+        start = time.perf_counter()
+        keys = [self.key(d) for d in devices]
+        wanted = set(keys)
+        if len(wanted) != len(keys) or len(self._row_index()) != len(self.devices):
+            # Rows can't be matched up by key, so replace them all
+            log.warning(f"{type(self).__name__}: repeated row keys, rebuilding list")
+            for row in reversed(range(len(self.devices))):
+                self._delete(row)
+            for row, (key, device) in enumerate(zip(keys, devices)):
+                self._insert(row, device, highlight=key in highlight, shade=key in shade)
+            self.model_time += time.perf_counter() - start
+            return
+
+        # Remove from the end such that earlier rows keep their index
+        for row in reversed(range(len(self.devices))):
+            if self.key(self.devices[row]) not in wanted:
+                self._delete(row)
+
+        # Every insert / delete shifts the rows after it, so rather than the row index
+        # (which would be rebuilt for every row of a first fill) rows are matched here
+        # by position, and only moved rows are searched for.
+        existing = {self.key(d) for d in self.devices}
+        for row, (key, device) in enumerate(zip(keys, devices)):
+            if row < len(self.devices) and self.key(self.devices[row]) == key:
+                self._update(row, device, shade=key in shade)
+                continue
+            moved = key in existing
+            if moved:
+                # Rows before this one already match devices, so it's further down
+                self._delete(next(
+                    i for i in range(row + 1, len(self.devices)) if self.key(self.devices[i]) == key
+                ))
+            self._insert(row, device, highlight=not moved and key in highlight, shade=key in shade)
+        self._row_index()
+        self.model_time += time.perf_counter() - start
 
     def Append(self, device, highlight=False, shade=False):
-        if device in self.devices:
-            pos = self.devices.index(device)
+        """
+        Add a row for device (in order of sort_key if set), or update its existing row.
+        """
+        start = time.perf_counter()
+        pos = self.IndexOf(device)
+        if pos != -1:
+            self._update(pos, device, shade=shade)
         else:
-            details = astuple(device)[0 : UltimateListCtrl.GetColumnCount(self)]
+            pos = len(self.devices)
+            if self.sort_key is not None:
+                sort_key = self.sort_key(device)
+                pos = next(
+                    (r for r, d in enumerate(self.devices) if self.sort_key(d) > sort_key), pos
+                )
+            self._insert(pos, device, highlight=highlight, shade=shade and not highlight)
+        self.model_time += time.perf_counter() - start
+        return pos
 
-            pos = self.GetItemCount()
-            self.InsertStringItem(pos, str(details[0] or "---"))
-            for i in range(1, len(details)):
-                if i == 1:
-                    self.SetStringItem(pos, i, str(details[i]))
-                else:
-                    # Checkbox column
-                    column = self.columns[i]
-                    value = getattr(device, column)
-                    info = UltimateListItem()
-                    info._text = ""
-                    info._mask = ULC_MASK_TEXT | ULC_MASK_KIND
-                    info._kind = 1
-                    info.Check(value)
-
-                    info._itemId = pos
-                    info._col = i
-                    self.SetItem(info)
-
-            self.devices.append(device)
-            if len(self.devices) != pos + 1:
-                raise ValueError(f"{self} devices out of sync")
-            if highlight:
-                self.HighlightRow(device, pos)
-            elif shade:
-                self.SetItemBackgroundColour(pos, wx.LIGHT_GREY)
+    def Update(self, device):
+        """
+        Re-render the row of device, if it's in the list.
+        """
+        pos = self.IndexOf(device)
+        if pos != -1:
+            self._update(pos, device, shade=self.model.shaded[pos])
+        return pos
+
+    def Remove(self, device):
+        pos = self.IndexOf(device)
+        if pos != -1:
+            self._delete(pos)
         return pos
 
 
@@ -1554,14 +2277,10 @@ class popupRename(wx.Dialog):
         default_btn = wx.Button(self, label=device.OrigDescription)
         top_sizer.Add(default_btn, flag=wx.RIGHT | wx.LEFT | wx.EXPAND, border=20)
 
-        try:
-            raw_devices, tree = InspectUsbDevices()
-        except:
-            log.exception("Failures in InspectUsbDevices")
-            raw_devices = {}
-
+        # From the last refresh, which will have included this device. Inspecting
+        # again here would block the gui, without details there's just no button.
         device_btn = None
-        if details := raw_devices.get(self.instanceId):
+        if details := self.gui.raw_devices.get(self.instanceId):
             if details.Manufacturer and details.Product:
                 dev_label = f"{details.Manufacturer} {details.Product}"
 
@@ -1664,6 +2383,27 @@ class popupOnConnectCommand(wx.Dialog):
         self.permissions_checkbox = wx.CheckBox(self, label="启用用户权限 (MODE=\"0666\")")
         top_sizer.Add(self.permissions_checkbox, flag=wx.TOP | wx.LEFT | wx.RIGHT, border=12)
 
+        # Serial port performance options
+        serial_label = wx.StaticText(self, label="串口性能选项：")
+        top_sizer.Add(serial_label, flag=wx.TOP | wx.LEFT | wx.RIGHT, border=12)
+
+        latency_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.latency_timer_checkbox = wx.CheckBox(self, label="设置 latency_timer (毫秒，FTDI 默认 16)：")
+        self.latency_timer_spin = wx.SpinCtrl(self, min=1, max=255, initial=1)
+        self.latency_timer_spin.Enable(False)
+        self.latency_timer_checkbox.Bind(
+            wx.EVT_CHECKBOX, lambda ev: self.latency_timer_spin.Enable(ev.IsChecked())
+        )
+        latency_sizer.Add(self.latency_timer_checkbox, flag=wx.ALIGN_CENTER_VERTICAL)
+        latency_sizer.Add(self.latency_timer_spin, flag=wx.LEFT, border=6)
+        top_sizer.Add(latency_sizer, flag=wx.TOP | wx.LEFT | wx.RIGHT, border=6)
+
+        self.low_latency_checkbox = wx.CheckBox(self, label="启用低延迟模式 (ASYNC_LOW_LATENCY，需要 setserial)")
+        top_sizer.Add(self.low_latency_checkbox, flag=wx.TOP | wx.LEFT | wx.RIGHT, border=6)
+
+        self.bulk_throughput_checkbox = wx.CheckBox(self, label="高吞吐模式 (禁用 USB 自动挂起)")
+        top_sizer.Add(self.bulk_throughput_checkbox, flag=wx.TOP | wx.LEFT | wx.RIGHT, border=12)
+
         # Buttons
         btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
         ok_btn = wx.Button(self, label="确定", size=self.FromDIP(wx.Size(60, 24)))
@@ -1684,17 +2424,30 @@ class popupOnConnectCommand(wx.Dialog):
 
     def load_existing_settings(self):
         """Load existing udev rule settings for this device"""
+        def apply(settings):
+            self.permissions_checkbox.SetValue(settings.permissions)
+            self.command_text.SetValue(settings.command or "")
+            self.latency_timer_checkbox.SetValue(settings.latency_timer is not None)
+            self.latency_timer_spin.Enable(settings.latency_timer is not None)
+            if settings.latency_timer is not None:
+                self.latency_timer_spin.SetValue(settings.latency_timer)
+            self.low_latency_checkbox.SetValue(settings.low_latency)
+            self.bulk_throughput_checkbox.SetValue(settings.bulk_throughput)
+
+        # Show the cached settings straight away, then check the rules file hasn't changed.
+        cached = None
+        if self.gui.udev_rules.loaded:
+            cached = self.gui.udev_rules.settings(self.vid, self.pid, self.serial) or DeviceRuleSettings()
+            apply(cached)
+
         async def load_async():
             try:
-                permissions_enabled, run_command = await self.gui.get_existing_udev_rules(
+                settings = await self.gui.get_existing_udev_rules(
                     self.vid, self.pid, self.serial
                 )
 
-                if permissions_enabled is not None:
-                    self.permissions_checkbox.SetValue(permissions_enabled)
-
-                if run_command is not None:
-                    self.command_text.SetValue(run_command)
+                if settings is not None and settings != cached:
+                    apply(settings)
 
             except Exception as ex:
                 log.error(f"无法加载现有 udev 设置: {ex}")
@@ -1708,12 +2461,20 @@ class popupOnConnectCommand(wx.Dialog):
         self.Close()
 
     def on_ok(self, event):
-        command = self.command_text.GetValue().strip()
-        permissions_enabled = self.permissions_checkbox.GetValue()
+        settings = DeviceRuleSettings(
+            permissions=self.permissions_checkbox.GetValue(),
+            command=self.command_text.GetValue().strip() or None,
+            latency_timer=(
+                self.latency_timer_spin.GetValue()
+                if self.latency_timer_checkbox.GetValue() else None
+            ),
+            low_latency=self.low_latency_checkbox.GetValue(),
+            bulk_throughput=self.bulk_throughput_checkbox.GetValue(),
+        )
 
         async def save_async():
             try:
-                await self.save_udev_rule(command, permissions_enabled)
+                await self.save_udev_rule(settings)
                 wx.CallAfter(self.Close)
             except Exception as ex:
                 log.error(f"无法保存 udev 规则: {ex}")
@@ -1727,51 +2488,18 @@ class popupOnConnectCommand(wx.Dialog):
             asyncio.ensure_future, save_async()
         )
 
-    async def save_udev_rule(self, command, permissions_enabled):
-        """Save the udev rule with the specified command and permissions"""
+    async def save_udev_rule(self, settings: DeviceRuleSettings):
+        """Save the udev rules for this device with the specified settings"""
         name = self.device.Description.replace(" ", "_")
-        rules_file = "/etc/udev/rules.d/99-wsl-usb-gui.rules"
-
-        # Remove existing rules for this device
-        udev_rule_match = f'/SUBSYSTEM=="usb.*ATTRS{{idVendor}}=="{self.vid}".*ATTRS{{idProduct}}=="{self.pid}".*ENV{{ID_SERIAL_SHORT}}=="{self.serial}"/d'
-
-        # Build new rules
-        rules = []
-
-        if permissions_enabled or command:
-            # Base attributes for both subsystems
-            base_attrs = f'ATTRS{{idVendor}}=="{self.vid}",ATTRS{{idProduct}}=="{self.pid}",ENV{{ID_SERIAL_SHORT}}=="{self.serial}"'
-
-            # USB/hidraw rule
-            usb_rule_parts = [f'SUBSYSTEM=="usb|hidraw"', base_attrs]
-            if permissions_enabled:
-                usb_rule_parts.extend([f'MODE="0666"', f'SYMLINK+="usb/{name}"'])
-            if command:
-                usb_rule_parts.append(f'RUN+="{command}"')
-            rules.append(','.join(usb_rule_parts))
-
-            # TTY rule
-            tty_rule_parts = [f'SUBSYSTEM=="tty"', base_attrs]
-            if permissions_enabled:
-                tty_rule_parts.extend([f'MODE="0666"', f'SYMLINK+="tty/{name}"'])
-            if command:
-                tty_rule_parts.append(f'RUN+="{command}"')
-            rules.append(','.join(tty_rule_parts))
-
-        # Execute the update
-        if rules:
-            udev_rule = '\n'.join(rules)
-            await run([
-                "wsl", "--user", "root", "sh", "-c",
-                f"sed -i '{udev_rule_match}' {rules_file}; echo '{udev_rule}' >> {rules_file}; sudo udevadm control --reload-rules; sudo udevadm trigger",
-            ])
-            log.info(f"已保存 udev 规则: {udev_rule}")
+
+        rules = await self.gui.udev_rules.get()
+        rules.set_device(self.vid, self.pid, self.serial, name, settings)
+        await self.gui.udev_rules.save(rules)
+        self.gui.refresh()
+
+        if settings:
+            log.info(f"已保存 udev 规则: {rules.device_lines(self.vid, self.pid, self.serial)}")
         else:
-            # Just remove existing rules if no settings specified
-            await run([
-                "wsl", "--user", "root", "sh", "-c",
-                f"sed -i '{udev_rule_match}' {rules_file}; sudo udevadm control --reload-rules; sudo udevadm trigger",
-            ])
             log.info(f"已为设备 VID:{self.vid} PID:{self.pid} 移除 udev 规则")
 
         # Show success message
@@ -1792,6 +2520,26 @@ def bg_af(fn):
     return wrap
 
 
+# InspectUsbDevices() works on module globals, so must not be run concurrently
+inspect_lock = threading.Lock()
+
+
+def inspect_usb_devices() -> Dict[str, Any]:
+    """
+    Windows USB device details by instance id, blocking.
+    """
+    # Loaded on first use, off the gui thread, as it defines a large number of ctypes prototypes
+    from .win_usb_inspect import InspectUsbDevices
+
+    with inspect_lock:
+        try:
+            raw_devices, tree = InspectUsbDevices()
+        except:
+            log.exception("Failures in InspectUsbDevices")
+            raw_devices = {}
+    return raw_devices
+
+
 def windows_events_callback(event):
     delay = 1.0
     if event == "attach":
@@ -1884,16 +2632,158 @@ class TaskBarIcon(wx.adv.TaskBarIcon):
         self.Destroy()
         # self.Close()
 
+class ElevationCache:
+    """
+    Remembers for the session which usbipd operations (eg. "bind") need to be
+    run elevated, such that they don't first fail unelevated every time.
+    Forgotten whenever the usbipd version changes.
+
+    Only operations which need elevation (or not) whatever the device are
+    remembered, eg. attach only does while the device isn't bound yet.
+    """
+    LEARNED_OPS = ("bind", "unbind")
+
+    def __init__(self):
+        self._elevated: Optional[bool] = None
+        self._version: Tuple[int, ...] = USBIPD_VERSION
+        self._required: Dict[str, bool] = {}
+
+    def is_elevated(self) -> bool:
+        if self._elevated is None:
+            try:
+                self._elevated = bool(ctypes.windll.shell32.IsUserAnAdmin())
+            except Exception:
+                self._elevated = False
+            log.info(f"Running elevated: {self._elevated}")
+        return self._elevated
+
+    def _check_version(self):
+        if self._version != USBIPD_VERSION:
+            self._version = USBIPD_VERSION
+            self._required.clear()
+
+    def required(self, op) -> bool:
+        self._check_version()
+        return not self.is_elevated() and self._required.get(op, False)
+
+    def learn(self, op, required):
+        if op not in self.LEARNED_OPS:
+            return
+        self._check_version()
+        if self._required.get(op) != required:
+            log.info(f"usbipd {op}: {'requires' if required else 'does not require'} elevation")
+        self._required[op] = required
+
+
+elevation = ElevationCache()
+
+
+def usbipd_cache_key():
+    """
+    Identify the usbipd executable by path, size and mtime, such that
+    cached probing results are discarded whenever it's upgraded.
+    """
+    exe = shutil.which(str(USBIPD))
+    if not exe:
+        return None
+    stat = os.stat(exe)
+    return [str(Path(exe).resolve()), stat.st_size, stat.st_mtime_ns]
+
+
+def parse_usbipd_policies(text: str) -> List[Dict[str, str]]:
+    """
+    Parse the table printed by `usbipd policy list` into a dict per rule, keyed by
+    the lower cased column headings (GUID, EFFECT, OPERATION, BUSID, HARDWARE-ID).
+    Columns are located by their heading, as BUSID / HARDWARE-ID may be blank.
+    """
+    lines = text.splitlines()
+    header = next((i for i, line in enumerate(lines) if "EFFECT" in line and "OPERATION" in line), None)
+    if header is None:
+        return []
+    starts = [m.start() for m in re.finditer(r"\S+", lines[header])]
+    names = [lines[header][start:end].strip().lower() for start, end in zip(starts, starts[1:] + [None])]
+    policies = []
+    for line in lines[header + 1:]:
+        if not line.strip():
+            continue
+        policies.append({
+            name: line[start:end].strip() for name, start, end in zip(names, starts, starts[1:] + [None])
+        })
+    return policies
+
+
+def usbipd_syntax_known() -> bool:
+    return bool(USBIPD_COMMANDS) or USBIPD_VERSION > (0, 0, 0)
+
+
+def usbipd_wsl_commands(action, bus_id) -> List[list]:
+    """
+    Build an attach / detach command in the syntax of the installed usbipd;
+    the "wsl" subcommand was replaced by "attach --wsl" / "detach" in v4.
+    If the version couldn't be determined both are returned, to be tried in order.
+    """
+    legacy_command = [USBIPD, "wsl", action, f"--busid={bus_id}"]
+    if action == "attach":
+        command = [USBIPD, "attach", "--wsl", f"--busid={bus_id}"]
+    else:
+        command = [USBIPD, action, f"--busid={bus_id}"]
+
+    if USBIPD_COMMANDS:
+        legacy = "wsl" in USBIPD_COMMANDS
+    elif USBIPD_VERSION > (0, 0, 0):
+        legacy = USBIPD_VERSION < (4, 0, 0)
+    else:
+        return [command, legacy_command]
+    return [legacy_command if legacy else command]
+
+
+def usbipd_wsl_command(action, bus_id) -> list:
+    """
+    The attach / detach command most likely to suit the installed usbipd.
+    """
+    return usbipd_wsl_commands(action, bus_id)[0]
+
+
 async def check_usbipd_version():
-    global USBIPD, USBIPD_VERSION
+    global USBIPD, USBIPD_VERSION, USBIPD_COMMANDS
+    key = usbipd_cache_key()
+    if key:
+        try:
+            cache = json.loads(USBIPD_CACHE_FILE.read_text())
+            if cache["key"] == key:
+                USBIPD_VERSION = tuple(cache["version"])
+                USBIPD_COMMANDS = set(cache["commands"])
+                return
+        except Exception:
+            pass
+
     try:
         vers_str = (await run([USBIPD, "--version"])).stdout
         vers_parts: re.Match[str] = re.search(r'(\d+)\.(\d+)\.(\d+)(?:[-+](\d+))?', vers_str) # type: ignore
-        version = tuple((int(v) for v in vers_parts.groups()))
+        version = tuple((int(v) for v in vers_parts.groups() if v is not None))
         USBIPD_VERSION = version
     except Exception as ex:
         log.error(f"Could not read usbipd version: {ex}")
         install_deps()
+        return
+
+    try:
+        help_str = (await run([USBIPD, "--help"])).stdout
+        USBIPD_COMMANDS = set(re.findall(r"^  ([a-z][\w-]*)\s", help_str, re.MULTILINE))
+    except Exception as ex:
+        log.error(f"Could not read usbipd commands: {ex}")
+        USBIPD_COMMANDS = set()
+
+    log.info(f"usbipd {'.'.join(map(str, USBIPD_VERSION))}: {', '.join(sorted(USBIPD_COMMANDS))}")
+    if key and USBIPD_COMMANDS:
+        try:
+            USBIPD_CACHE_FILE.write_text(json.dumps(dict(
+                key=key,
+                version=USBIPD_VERSION,
+                commands=sorted(USBIPD_COMMANDS),
+            ), indent=4))
+        except OSError as ex:
+            log.warning(f"Could not cache usbipd details: {ex}")
 
 
 class CustomProfileDialog(wx.Dialog):
@@ -1965,7 +2855,7 @@ class CustomProfileDialog(wx.Dialog):
         self.SetMinSize((600, -1))  # Set minimum width
 
     def on_ok(self, event):
-        """Validate regex patterns before accepting the dialog"""
+        """Validate regex patterns before accepting the dialog, compiling them for the next refresh"""
         bus_id, description, instance_id = self.get_values()
 
         # Validate regex patterns
@@ -1979,7 +2869,7 @@ class CustomProfileDialog(wx.Dialog):
             if value and value.startswith("re:"):
                 pattern = value[3:]
                 try:
-                    re.compile(pattern)
+                    regex_cache.compile(pattern)
                 except re.error as e:
                     wx.MessageBox(
                         f"在 {field_name} 中存在无效正则表达式模式：\n{pattern}\n\n错误：{str(e)}",
@@ -2028,10 +2918,47 @@ class SettingsWindow(wx.Dialog):
         self.notify_new_device_checkbox = wx.CheckBox(outer_panel, label="任务栏通知")
         self.notify_new_device_checkbox.SetValue(parent.notify_on_new_device)
 
+        # usbipd auto-attach checkbox
+        self.auto_attach_checkbox = wx.CheckBox(outer_panel, label="由 usbipd 自动重新附加按总线 ID 固定的设备 (--auto-attach)")
+        self.auto_attach_checkbox.SetValue(parent.usbipd_auto_attach)
+
+        # Prepare pinned devices checkbox
+        self.prepare_pinned_checkbox = wx.CheckBox(outer_panel, label="启动时预先绑定固定设备（一次提升权限）")
+        self.prepare_pinned_checkbox.SetValue(parent.prepare_pinned_at_start)
+
+        # Keep WSL warm checkbox, with the resources WSL is currently using
+        self.keep_warm_checkbox = wx.CheckBox(outer_panel, label="启用自动附加时保持 WSL 运行（加快附加速度）")
+        self.keep_warm_checkbox.SetValue(parent.keep_wsl_warm)
+        # Measuring starts WSL, so only done when asked for
+        keep_warm_cost_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.keep_warm_cost = wx.StaticText(outer_panel, label=self.keep_warm_cost_label())
+        self.keep_warm_measure = wx.Button(outer_panel, label="测量")
+        wxasync.AsyncBind(wx.EVT_BUTTON, self.load_keep_warm_cost, self.keep_warm_measure)
+        keep_warm_cost_sizer.Add(self.keep_warm_cost, flag=wx.ALIGN_CENTER_VERTICAL)
+        keep_warm_cost_sizer.Add(self.keep_warm_measure, flag=wx.LEFT, border=6)
+
+        # Distro wide usbfs buffer limit, stored in the udev rules
+        usbfs_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.usbfs_memory_checkbox = wx.CheckBox(outer_panel, label="WSL usbfs 内存上限 (MB，默认 16)：")
+        self.usbfs_memory_spin = wx.SpinCtrl(outer_panel, min=16, max=4096, initial=256)
+        self.usbfs_memory_checkbox.Enable(False)
+        self.usbfs_memory_spin.Enable(False)
+        self.usbfs_memory_checkbox.Bind(
+            wx.EVT_CHECKBOX, lambda ev: self.usbfs_memory_spin.Enable(ev.IsChecked())
+        )
+        usbfs_sizer.Add(self.usbfs_memory_checkbox, flag=wx.ALIGN_CENTER_VERTICAL)
+        usbfs_sizer.Add(self.usbfs_memory_spin, flag=wx.LEFT, border=6)
+        self.usbfs_memory: Optional[int] = None
+
         # Add checkboxes to sizer
         sizer.Add(self.minimize_tray_checkbox, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
         sizer.Add(self.auto_start_checkbox, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
         sizer.Add(self.notify_new_device_checkbox, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
+        sizer.Add(self.auto_attach_checkbox, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
+        sizer.Add(self.prepare_pinned_checkbox, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
+        sizer.Add(self.keep_warm_checkbox, 0, wx.LEFT | wx.RIGHT | wx.TOP | wx.ALIGN_LEFT, border=8)
+        sizer.Add(keep_warm_cost_sizer, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM | wx.ALIGN_LEFT, border=8)
+        sizer.Add(usbfs_sizer, 0, wx.ALL | wx.ALIGN_LEFT, border=8)
 
         close_button = wx.Button(outer_panel, label="关闭")
         sizer.AddSpacer(8)
@@ -2047,6 +2974,47 @@ class SettingsWindow(wx.Dialog):
         # Set the dialog sizer
         self.SetSizerAndFit(outer_sizer)
 
+        asyncio.get_running_loop().call_soon_threadsafe(
+            asyncio.ensure_future, self.load_usbfs_memory()
+        )
+
+    async def load_usbfs_memory(self):
+        try:
+            rules = await self.parent.udev_rules.get()
+        except Exception as ex:
+            log.error(f"无法加载 udev 规则: {ex}")
+            return
+        self.usbfs_memory = rules.usbfs_memory()
+        if self:  # Window may have been closed meanwhile
+            self.usbfs_memory_checkbox.Enable(True)
+            self.usbfs_memory_checkbox.SetValue(self.usbfs_memory is not None)
+            self.usbfs_memory_spin.Enable(self.usbfs_memory is not None)
+            if self.usbfs_memory is not None:
+                self.usbfs_memory_spin.SetValue(self.usbfs_memory)
+
+    def keep_warm_cost_label(self, measured=None) -> str:
+        keep_warm = self.parent.keep_warm
+        cost = keep_warm.last_cost
+        if cost is not None:
+            memory, cpu = cost
+            label = f"    WSL 资源占用：内存 {memory} MB，CPU {cpu:.1f}%"
+        elif measured:
+            label = "    WSL 资源占用：未知"
+        else:
+            label = "    WSL 资源占用：未测量"
+        if keep_warm.start_latency is not None:
+            label += f"，启动耗时 {keep_warm.start_latency:.1f}s"
+        return label
+
+    async def load_keep_warm_cost(self, event=None):
+        self.keep_warm_measure.Enable(False)
+        self.keep_warm_cost.SetLabel("    WSL 资源占用：读取中...")
+        await self.parent.keep_warm.measure(self.parent.wsl)
+        if self:  # Window may have been closed meanwhile
+            self.keep_warm_cost.SetLabel(self.keep_warm_cost_label(measured=True))
+            self.keep_warm_measure.Enable(True)
+            self.Fit()
+
 
     def Save(self, _):
         need_save = False
@@ -2063,9 +3031,32 @@ class SettingsWindow(wx.Dialog):
             self.parent.notify_on_new_device = self.notify_new_device_checkbox.Value
             need_save = True
 
+        if self.auto_attach_checkbox.Value != self.parent.usbipd_auto_attach:
+            self.parent.usbipd_auto_attach = self.auto_attach_checkbox.Value
+            self.parent.update_auto_attach()
+            need_save = True
+
+        if self.prepare_pinned_checkbox.Value != self.parent.prepare_pinned_at_start:
+            self.parent.prepare_pinned_at_start = self.prepare_pinned_checkbox.Value
+            need_save = True
+
+        if self.keep_warm_checkbox.Value != self.parent.keep_wsl_warm:
+            self.parent.keep_wsl_warm = self.keep_warm_checkbox.Value
+            self.parent.update_keep_warm()
+            need_save = True
+
         if need_save:
             self.parent.save_config()
 
+        if self.usbfs_memory_checkbox.IsEnabled():
+            usbfs_memory = (
+                self.usbfs_memory_spin.GetValue() if self.usbfs_memory_checkbox.Value else None
+            )
+            if usbfs_memory != self.usbfs_memory:
+                asyncio.get_running_loop().call_soon_threadsafe(
+                    asyncio.ensure_future, self.parent.set_usbfs_memory(usbfs_memory)
+                )
+
         self.Close()
 
 async def amain():
@@ -2079,6 +3070,12 @@ async def amain():
     parser.add_argument("--minimised", action="store_true", help="Start app minimised to tray")
     args = parser.parse_args()
 
+    # High DPI Support, must be set before any window is created.
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(True)
+    except:
+        pass
+
     app = wxasync.WxAsyncApp(False)
 
     # Generate a unique instance name based on user ID and app dir path hash
@@ -2105,22 +3102,38 @@ async def amain():
 
     await check_usbipd_version()
 
-    bundled_ver = MSI_VERS if MSI_VERS > (0, 0, 0,) else (4, 0, 0)
+    if gui.first_run != __version__:
+        # Only looked for after an upgrade, not at every (login) start
+        from .install import find_installers
 
-    if gui.first_run != __version__ and USBIPD_VERSION < bundled_ver:
-        log.warning("version upgrade detected, install deps")
-        install_deps()
-        await check_usbipd_version()
+        _, bundled_ver = find_installers()
+        if bundled_ver <= (0, 0, 0):
+            bundled_ver = (4, 0, 0)
+        if USBIPD_VERSION < bundled_ver:
+            log.warning("version upgrade detected, install deps")
+            install_deps()
+            await check_usbipd_version()
 
+    gui.update_auto_attach()
     gui.refresh(delay=0.5)
+    if gui.prepare_pinned_at_start:
+        asyncio.create_task(gui.prepare_pinned_devices())
 
     # TODO
     devNotifyHandle = registerDeviceNotification(handle=gui.GetHandle(), callback=windows_events_callback)
 
-    await gui.check_wsl_udev()
+    # Only boots WSL now if it's being kept running, otherwise checked on the first attach
+    if gui.keep_warm.enabled:
+        gui.check_wsl_ready()
 
+    wsl_shell, udev_monitor, keep_warm, auto_attach = gui.wsl, gui.udev_monitor, gui.keep_warm, gui.auto_attach
     await app.MainLoop()
 
+    await keep_warm.close()
+    await auto_attach.close()
+    await udev_monitor.close()
+    await wsl_shell.close()
+
     try:
         unregisterDeviceNotification(devNotifyHandle)
     except:
@@ -2128,6 +3141,7 @@ async def amain():
 
 
 def main():
+    setup_logging()
     asyncio.run(amain())
 
 
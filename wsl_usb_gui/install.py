@@ -8,13 +8,14 @@ import re
 from pathlib import Path
 
 user_data_dir = Path(appdirs.user_data_dir("wsl-usb-gui", ""))
-user_data_dir.mkdir(parents=True, exist_ok=True)
-
 install_log = user_data_dir / "install.log"
-print("日志记录到", install_log)
-logging.basicConfig(format="%(asctime)s | %(levelname)-8s | %(message)s", filename=install_log, encoding='utf-8', level=logging.DEBUG)
 
-logging.info("正在运行安装后脚本")
+
+def setup_logging():
+    user_data_dir.mkdir(parents=True, exist_ok=True)
+    print("日志记录到", install_log)
+    logging.basicConfig(format="%(asctime)s | %(levelname)-8s | %(message)s", filename=install_log, encoding='utf-8', level=logging.DEBUG)
+    logging.info("正在运行安装后脚本")
 
 
 def run(args, show=False):
@@ -137,8 +138,12 @@ def install_client():
 
 
 def find_installers():
+    """
+    The bundled usbipd-win installer (if any) and its version, (0, 0, 0) if unknown.
+    """
     msi = None
     msi_vers = (0, 0, 0)
+    app_dir = Path(sys.executable).parent.resolve()
     try:
         src_dir = Path(__file__).parent.parent.resolve()
     except:
@@ -154,19 +159,16 @@ def find_installers():
     return msi, msi_vers
 
 
-app_dir = Path(sys.executable).parent.resolve()
-MSI, MSI_VERS = find_installers()
-
-
 def install_server():
 
     try:
-        if not MSI:
-            msg = f"无法在以下位置找到usbipd-win安装程序： {app_dir}"
+        msi, _ = find_installers()
+        if not msi:
+            msg = f"无法在以下位置找到usbipd-win安装程序： {Path(sys.executable).parent.resolve()}"
             raise OSError(msg)
 
         usbipd_install_log = user_data_dir / "usbipd_install.log"
-        cmd = f'msiexec /i "{MSI}" /passive /norestart /log "{usbipd_install_log}"'
+        cmd = f'msiexec /i "{msi}" /passive /norestart /log "{usbipd_install_log}"'
         logging.info(cmd.encode())
         rsp = run(cmd)
         return True
@@ -185,6 +187,7 @@ root_win = None
 
 
 def install_task(parent=None):
+    setup_logging()
     if parent is None:
         __app = wx.App()
 
@@ -0,0 +1,169 @@
+import re
+from collections import OrderedDict
+from typing import *
+
+from .logger import log
+
+# Profile fields, in order of preference for indexing exact matches
+FIELDS = ("InstanceId", "BusId", "Description")
+
+
+
+class InvalidPattern(NamedTuple):
+    msg: str
+    pos: Optional[int]
+
+
+class RegexCache:
+    """
+    Least recently used cache of compiled (case insensitive) profile regexes.
+
+    Invalid patterns are cached too, so each is only compiled and reported once.
+    Only their error details are kept, a new re.error is raised each time rather
+    than re-raising one (which would hold on to, and keep growing, its traceback).
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._patterns: "OrderedDict[str, Union[re.Pattern, InvalidPattern]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def compile(self, pattern: str) -> re.Pattern:
+        """
+        Raises re.error if pattern is invalid.
+        """
+        compiled = self._patterns.get(pattern)
+        if compiled is None:
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as ex:
+                log.error(f"Invalid regex pattern: {pattern}: {ex}")
+                compiled = InvalidPattern(ex.msg, ex.pos)
+            self._patterns[pattern] = compiled
+            if len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+        else:
+            self._patterns.move_to_end(pattern)
+        if isinstance(compiled, InvalidPattern):
+            raise re.error(compiled.msg, pattern, compiled.pos)
+        return compiled
+
+
+regex_cache = RegexCache()
+
+
+def profile_conditions(profile) -> List[Tuple[str, str, bool]]:
+    """
+    The (field, value, is regex) checks a device must pass to match profile.
+
+    Empty fields match anything. The description is only checked if no BusId /
+    InstanceId is set, unless it is a regex.
+    """
+    conditions = []
+    for field in FIELDS:
+        value = (getattr(profile, field) or "").strip()
+        if not value:
+            continue
+        regex = value.startswith("re:")
+        if field == "Description" and not regex and (profile.InstanceId or profile.BusId):
+            # Only fallback to description if no other filter set
+            continue
+        conditions.append((field, value[3:] if regex else value, regex))
+    return conditions
+
+
+class ProfileMatcher:
+    """
+    A list of profiles compiled for matching devices against.
+
+    Profiles with an exact (non regex) InstanceId, BusId or Description are
+    indexed by that value, so are only checked against devices which have it.
+    The regexes of the remaining profiles are combined into one pattern per
+    field, which rules them all out in one search for most devices.
+    Matches are returned in profile order.
+    """
+
+    def __init__(self, profiles: Iterable[Any] = ()):
+        self.profiles = list(profiles)
+        self._conditions: List[List[Tuple[str, Any, bool]]] = []
+        self._exact: Dict[Tuple[str, str], List[int]] = {}
+        self._scan: List[int] = []
+        # Regex only profiles grouped by their first regex field, with a combined pattern if possible
+        self._prefilter: Dict[str, Tuple[Optional[re.Pattern], List[int]]] = {}
+
+        groups: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+        for index, profile in enumerate(self.profiles):
+            conditions = []
+            for field, value, regex in profile_conditions(profile):
+                if regex:
+                    try:
+                        value = regex_cache.compile(value)
+                    except re.error:
+                        conditions = None
+                        break
+                conditions.append((field, value, regex))
+            self._conditions.append(conditions)
+            if conditions is None:
+                continue  # Can never match
+
+            exact = next(((f, v) for f, v, regex in conditions if not regex), None)
+            if exact is not None:
+                self._exact.setdefault(exact, []).append(index)
+            elif conditions:
+                field, pattern, _ = conditions[0]
+                groups.setdefault(field, []).append((index, pattern))
+            else:
+                self._scan.append(index)
+
+        for field, patterns in groups.items():
+            self._prefilter[field] = (self._combine(p for _, p in patterns), [i for i, _ in patterns])
+
+    @staticmethod
+    def _combine(patterns: Iterable[re.Pattern]) -> Optional[re.Pattern]:
+        # Group numbers shift when patterns are combined, so any with groups
+        # (which backreferences need) are left out of the prefilter.
+        patterns = list(patterns)
+        if any(p.groups for p in patterns):
+            return None
+        try:
+            return re.compile("|".join(f"(?:{p.pattern})" for p in patterns), re.IGNORECASE)
+        except re.error:
+            # eg. global flags part way through the combined pattern
+            return None
+
+    def _candidates(self, device) -> Iterable[int]:
+        values = {field: (getattr(device, field) or "").strip() for field in FIELDS}
+        candidates = list(self._scan)
+        for field in FIELDS:
+            candidates.extend(self._exact.get((field, values[field]), ()))
+        for field, (combined, indexes) in self._prefilter.items():
+            if combined is None or combined.search(values[field]):
+                candidates.extend(indexes)
+        return sorted(candidates)
+
+    def _check(self, index: int, device) -> bool:
+        for field, value, regex in self._conditions[index]:
+            device_value = (getattr(device, field) or "").strip()
+            if regex:
+                if not value.search(device_value):
+                    return False
+            elif value != device_value:
+                return False
+        return True
+
+    def matches(self, device) -> List[Any]:
+        """
+        All the profiles device matches.
+        """
+        return [self.profiles[i] for i in self._candidates(device) if self._check(i, device)]
+
+    def match(self, device) -> Optional[Any]:
+        """
+        The first profile device matches, if any.
+        """
+        for index in self._candidates(device):
+            if self._check(index, device):
+                return self.profiles[index]
+        return None
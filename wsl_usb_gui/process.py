@@ -0,0 +1,30 @@
+import asyncio
+from collections import namedtuple
+
+CREATE_NO_WINDOW = 0x08000000
+
+ProcResult = namedtuple("ProcResult", ("stdout", "stderr", "returncode"))
+
+
+async def run(args, decode=True):
+    if isinstance(args, str):
+        proc = await asyncio.create_subprocess_shell(
+            args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=CREATE_NO_WINDOW,
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            creationflags=CREATE_NO_WINDOW,
+        )
+
+    stdout, stderr = await proc.communicate()
+    # Recreate a basic "process results" object to return.
+    if decode:
+        return ProcResult(stdout.decode(), stderr.decode(), proc.returncode)
+    else:
+        return ProcResult(stdout, stderr, proc.returncode)
@@ -0,0 +1,136 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import *
+
+from .logger import log
+
+
+class RefreshScheduler:
+    """
+    Coalesces refresh requests, eg. the burst of device change events from a hub.
+
+    At most one refresh runs at a time with at most one more pending. A pending
+    refresh starts once no request has arrived for the (most recently) requested
+    delay, but never more than max_wait after the first request it covers.
+    A request arriving while a refresh is running always gets a refresh after it,
+    so the final state is reflected.
+
+    clock and sleep can be replaced, eg. with a virtual clock.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Awaitable],
+        max_wait: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self._refresh = refresh
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._due: Optional[float] = None  # When the pending refresh should start
+        self._first: Optional[float] = None  # When the first pending request arrived
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.running = False
+
+    @property
+    def pending(self) -> bool:
+        return self._due is not None
+
+    def trigger(self, delay: float = 0.0):
+        """
+        Request a refresh in delay seconds, must be called from the event loop thread.
+        """
+        now = self._clock()
+        if self._first is None:
+            self._first = now
+        self._due = now + delay
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._wake.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self._due is not None:
+                wait = min(self._due, self._first + self.max_wait) - self._clock()
+                if wait > 0:
+                    # Sleep, unless another request changes the deadline
+                    self._wake.clear()
+                    sleeper = asyncio.ensure_future(self._sleep(wait))
+                    waker = asyncio.ensure_future(self._wake.wait())
+                    try:
+                        await asyncio.wait((sleeper, waker), return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        sleeper.cancel()
+                        waker.cancel()
+                    continue
+
+                # Requests from here on need another refresh
+                self._due = self._first = None
+                self.running = True
+                try:
+                    await self._refresh()
+                except Exception:
+                    log.exception("refresh failed")
+                finally:
+                    self.running = False
+        finally:
+            self._task = None
+
+
+@dataclass
+class AttachBackoff:
+    """
+    Circuit breaker for auto-attaching one device.
+    After a failed auto-attach the circuit opens and further attempts are skipped
+    until the (exponential, jittered) backoff expires, then a single trial attach
+    is allowed (half-open) which either closes the circuit or re-opens it.
+    """
+    failures: int = 0
+    state: str = "closed"  # closed, open or half-open
+    retry_at: float = 0.0
+
+    BASE_DELAY = 2.0
+    MAX_DELAY = 300.0
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() >= self.retry_at:
+            self.state = "half-open"
+            return True
+        return self.state == "closed"
+
+    def success(self):
+        self.failures = 0
+        self.state = "closed"
+        self.retry_at = 0.0
+
+    def release(self):
+        """
+        End a half-open trial which had no outcome (eg. it was cancelled), without
+        counting a failure, so the next allow() permits another trial.
+        """
+        if self.state == "half-open":
+            self.state = "open" if self.failures else "closed"
+
+    def failure(self) -> float:
+        self.failures += 1
+        delay = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (self.failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        self.state = "open"
+        self.retry_at = time.monotonic() + delay
+        return delay
+
+    def describe(self) -> str:
+        if self.state == "open":
+            # A fixed time of day rather than a countdown, which would go stale until the next refresh
+            retry_at = time.time() + max(0.0, self.retry_at - time.monotonic())
+            return f"自动附加失败 {self.failures} 次，{time.strftime('%H:%M:%S', time.localtime(retry_at))} 重试"
+        if self.state == "half-open":
+            return "自动附加重试中"
+        return ""
@@ -0,0 +1,322 @@
+import base64
+import re
+from dataclasses import dataclass
+from typing import *
+
+from .logger import log
+
+RULES_FILE = "/etc/udev/rules.d/99-wsl-usb-gui.rules"
+
+# Rules generated for a specific device all match on vid, pid and serial.
+DEVICE_MATCH = re.compile(
+    r'ATTRS\{idVendor\}=="([^"]*)".*ATTRS\{idProduct\}=="([^"]*)".*ENV\{ID_SERIAL_SHORT\}=="([^"]*)"'
+)
+RUN_MATCH = re.compile(r'RUN\+="([^"]+)"')
+LATENCY_TIMER_MATCH = re.compile(r'ATTR\{device/latency_timer\}="(\d+)"')
+
+USBFS_MEMORY_PARAM = "/sys/module/usbcore/parameters/usbfs_memory_mb"
+USBFS_MEMORY_DEFAULT = 16
+# Distro wide usbfs buffer limit, re-applied by udev whenever a device is added
+USBFS_MEMORY_RULE = (
+    'ACTION=="add",SUBSYSTEM=="usb",ENV{{DEVTYPE}}=="usb_device",'
+    f'RUN+="/bin/sh -c \'echo {{}} > {USBFS_MEMORY_PARAM}\'"'
+)
+USBFS_MEMORY_MATCH = re.compile(r"echo (\d+) > " + re.escape(USBFS_MEMORY_PARAM))
+
+# Sets ASYNC_LOW_LATENCY on serial ports, skipped if setserial isn't installed
+LOW_LATENCY_RUN = "/bin/sh -c 'command -v setserial >/dev/null && setserial /dev/%k low_latency || true'"
+
+DeviceKey = Tuple[str, str, str]  # (vid, pid, serial)
+
+
+@dataclass
+class DeviceRuleSettings:
+    """
+    The options that can be configured for a device through udev rules.
+    """
+    permissions: bool = False
+    command: Optional[str] = None
+    # Serial ports: usb-serial latency timer in ms (FTDI default is 16) and ASYNC_LOW_LATENCY
+    latency_timer: Optional[int] = None
+    low_latency: bool = False
+    # Keep the device out of runtime autosuspend, for sustained bulk transfers
+    bulk_throughput: bool = False
+
+    def __bool__(self):
+        return (
+            self.permissions or bool(self.command)
+            or self.latency_timer is not None or self.low_latency
+            or self.bulk_throughput
+        )
+
+    def tuning(self) -> List[str]:
+        """
+        Short labels for the active performance options.
+        """
+        labels = []
+        if self.latency_timer is not None:
+            labels.append(f"延迟 {self.latency_timer}ms")
+        if self.low_latency:
+            labels.append("低延迟")
+        if self.bulk_throughput:
+            labels.append("高吞吐")
+        return labels
+
+
+def device_rules(vid, pid, serial, name, settings: DeviceRuleSettings) -> List[str]:
+    """
+    Build the rule lines for a device, VID and PID must be lowercase hex.
+    """
+    if not settings:
+        return []
+
+    # Base attributes for both subsystems
+    base_attrs = f'ATTRS{{idVendor}}=="{vid}",ATTRS{{idProduct}}=="{pid}",ENV{{ID_SERIAL_SHORT}}=="{serial}"'
+    rules = []
+
+    # USB/hidraw rule
+    usb_rule_parts = [f'SUBSYSTEM=="usb|hidraw"', base_attrs]
+    if settings.permissions:
+        usb_rule_parts.extend([f'MODE="0666"', f'SYMLINK+="usb/{name}"'])
+    if settings.command:
+        usb_rule_parts.append(f'RUN+="{settings.command}"')
+    rules.append(','.join(usb_rule_parts))
+
+    # TTY rule
+    tty_rule_parts = [f'SUBSYSTEM=="tty"', base_attrs]
+    if settings.permissions:
+        tty_rule_parts.extend([f'MODE="0666"', f'SYMLINK+="tty/{name}"'])
+    if settings.latency_timer is not None:
+        tty_rule_parts.append(f'ATTR{{device/latency_timer}}="{settings.latency_timer}"')
+    if settings.low_latency:
+        tty_rule_parts.append(f'RUN+="{LOW_LATENCY_RUN}"')
+    if settings.command:
+        tty_rule_parts.append(f'RUN+="{settings.command}"')
+    rules.append(','.join(tty_rule_parts))
+
+    # Power management applies to the usb device itself, not its interfaces
+    if settings.bulk_throughput:
+        rules.append(','.join([
+            'SUBSYSTEM=="usb"', 'ENV{DEVTYPE}=="usb_device"', base_attrs,
+            'ATTR{power/control}="on"', 'ATTR{power/autosuspend}="-1"',
+        ]))
+
+    return rules
+
+
+def parse_device_settings(lines: Iterable[str]) -> DeviceRuleSettings:
+    settings = DeviceRuleSettings()
+    for line in lines:
+        if 'MODE="0666"' in line:
+            settings.permissions = True
+        if 'ATTR{power/control}="on"' in line:
+            settings.bulk_throughput = True
+        if latency_match := LATENCY_TIMER_MATCH.search(line):
+            settings.latency_timer = int(latency_match.group(1))
+        for run in RUN_MATCH.findall(line):
+            if run == LOW_LATENCY_RUN:
+                settings.low_latency = True
+            else:
+                settings.command = run
+    return settings
+
+
+def device_key(line: str) -> Optional[DeviceKey]:
+    if match := DEVICE_MATCH.search(line):
+        return match.groups()
+    return None
+
+
+class UdevRules:
+    """
+    In-memory model of RULES_FILE.
+
+    Edits for any number of devices are made in memory then written back in one
+    go by save(): the file is replaced atomically, udev rules are reloaded once
+    and only the affected devices are re-triggered.
+    """
+
+    def __init__(self, text=""):
+        self.lines: List[str] = [l for l in text.splitlines() if l.strip()]
+        self._original = list(self.lines)
+        self._triggers: Set[Tuple[str, str]] = set()  # (vid, pid)
+        self._trigger_all = False
+        self._commands: List[str] = []  # Run once the rules are saved
+
+    @property
+    def changed(self) -> bool:
+        return self.lines != self._original
+
+    def devices(self) -> Dict[DeviceKey, List[str]]:
+        index: Dict[DeviceKey, List[str]] = {}
+        for line in self.lines:
+            if key := device_key(line):
+                index.setdefault(key, []).append(line)
+        return index
+
+    def device_lines(self, vid, pid, serial) -> List[str]:
+        return [l for l in self.lines if device_key(l) == (vid, pid, serial)]
+
+    def settings(self, vid, pid, serial) -> DeviceRuleSettings:
+        return parse_device_settings(self.device_lines(vid, pid, serial))
+
+    def set_device(self, vid, pid, serial, name, settings: DeviceRuleSettings):
+        """
+        Replace all rules for this device, in place of the first existing one.
+        """
+        new_lines = device_rules(vid, pid, serial, name, settings)
+        key = (vid, pid, serial)
+        lines = []
+        inserted = False
+        for line in self.lines:
+            if device_key(line) == key:
+                if not inserted:
+                    lines.extend(new_lines)
+                    inserted = True
+            else:
+                lines.append(line)
+        if not inserted:
+            lines.extend(new_lines)
+        if lines != self.lines:
+            self.lines = lines
+            self._triggers.add((vid, pid))
+
+    def add_rule(self, rule: str):
+        """
+        Add a rule applying to all devices (if not already present).
+        """
+        if rule not in self.lines:
+            self.lines.append(rule)
+            self._trigger_all = True
+
+    def usbfs_memory(self) -> Optional[int]:
+        """
+        The usbfs memory limit (MB) set by these rules, None if left at the kernel default.
+        """
+        for line in self.lines:
+            if match := USBFS_MEMORY_MATCH.search(line):
+                return int(match.group(1))
+        return None
+
+    def set_usbfs_memory(self, size_mb: Optional[int]):
+        """
+        Set (or with None remove) the usbfs memory limit, also applied immediately on save.
+        """
+        if size_mb == self.usbfs_memory():
+            return
+        self.lines = [l for l in self.lines if not USBFS_MEMORY_MATCH.search(l)]
+        if size_mb is not None:
+            self.lines.append(USBFS_MEMORY_RULE.format(int(size_mb)))
+        self._commands.append(
+            f"echo {USBFS_MEMORY_DEFAULT if size_mb is None else int(size_mb)} > {USBFS_MEMORY_PARAM}"
+        )
+
+    def render(self) -> str:
+        return "".join(f"{line}\n" for line in self.lines)
+
+    def _trigger_command(self) -> str:
+        if self._trigger_all:
+            return "udevadm trigger --subsystem-match=usb --subsystem-match=tty --subsystem-match=hidraw"
+        commands = []
+        for vid, pid in sorted(self._triggers):
+            commands.append(
+                'for d in /sys/bus/usb/devices/*; do '
+                f'[ "$(cat $d/idVendor 2>/dev/null)" = "{vid}" ] && '
+                f'[ "$(cat $d/idProduct 2>/dev/null)" = "{pid}" ] && '
+                'udevadm trigger --parent-match="$d"; '
+                'done'
+            )
+        return "; ".join(commands) or "true"
+
+    async def save(self, shell):
+        """
+        Atomically write the rules file, reload udev and trigger affected devices.
+        """
+        if not self.changed:
+            return None
+        encoded = base64.b64encode(self.render().encode()).decode()
+        result = await shell.run(
+            f"mkdir -p $(dirname {RULES_FILE}) && "
+            f"printf '%s' '{encoded}' | base64 -d > {RULES_FILE}.tmp && "
+            f"mv {RULES_FILE}.tmp {RULES_FILE} && "
+            f"udevadm control --reload-rules && "
+            f"{{ {'; '.join(self._commands + [self._trigger_command()])}; true; }}"
+        )
+        if result.returncode != 0:
+            raise OSError(f"Could not update {RULES_FILE}: {result.stderr}")
+        log.info(f"udev rules updated: {len(self.lines)} rules")
+        self._original = list(self.lines)
+        self._triggers.clear()
+        self._trigger_all = False
+        self._commands.clear()
+        return result
+
+
+class UdevRulesCache:
+    """
+    Session cache of the parsed rules file, indexed by (vid, pid, serial).
+
+    Loaded once, then kept up to date by our own writes through save().
+    get() revalidates against the file checksum so edits made outside
+    the gui are still picked up.
+    """
+
+    def __init__(self, shell):
+        self.shell = shell
+        self.rules: Optional[UdevRules] = None
+        self.index: Dict[DeviceKey, DeviceRuleSettings] = {}
+        self._stamp: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.rules is not None
+
+    async def _read_stamp(self) -> str:
+        result = await self.shell.run(f"cksum {RULES_FILE} 2>/dev/null || echo")
+        if result.returncode != 0:
+            raise OSError(f"Could not read {RULES_FILE}: {result.stderr}")
+        return result.stdout.strip()
+
+    def _update(self, rules: UdevRules, stamp: str):
+        self.rules = rules
+        self._stamp = stamp
+        self.index = {
+            key: parse_device_settings(lines) for key, lines in rules.devices().items()
+        }
+
+    async def get(self, validate=True) -> UdevRules:
+        """
+        Returns a copy of the rules model, which can be edited and passed to save().
+        """
+        if self.rules is not None and validate:
+            if await self._read_stamp() != self._stamp:
+                log.info(f"{RULES_FILE} changed, reloading")
+                self.rules = None
+
+        if self.rules is None:
+            # First line is the checksum (blank if the file doesn't exist yet)
+            result = await self.shell.run(
+                f"cksum {RULES_FILE} 2>/dev/null || echo; cat {RULES_FILE} 2>/dev/null; true"
+            )
+            if result.returncode != 0:
+                raise OSError(f"Could not read {RULES_FILE}: {result.stderr}")
+            stamp, _, text = result.stdout.partition("\n")
+            self._update(UdevRules(text), stamp.strip())
+
+        return UdevRules(self.rules.render())
+
+    async def save(self, rules: UdevRules):
+        try:
+            result = await rules.save(self.shell)
+        except Exception:
+            self.rules = None
+            raise
+        if result is not None:
+            self._update(UdevRules(rules.render()), await self._read_stamp())
+        return result
+
+    def settings(self, vid, pid, serial) -> Optional[DeviceRuleSettings]:
+        """
+        Instant lookup from the cached index, None if not loaded / no rules for device.
+        """
+        return self.index.get((vid, pid, serial))
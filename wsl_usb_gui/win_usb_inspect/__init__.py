@@ -51,6 +51,7 @@ class USB_DEVICE_PNP_STRINGS:
         self.Service = ""
         self.DeviceClass = ""
         self.PowerState = ""
+        self.DevInst = 0
 
 
 class USBHOSTCONTROLLERINFO:
@@ -106,6 +107,7 @@ class USBDEVICEINFO:
         self.SerialNumber = ""
         self.Manufacturer = ""
         self.Product = ""
+        self.PortName = ""  # eg. COM3, from the device or one of its interfaces
 
         self.DeviceInfoType: Optional[USBDEVICEINFOTYPE] = USBDEVICEINFOTYPE()
         self.HubInfo: Optional[USB_NODE_INFORMATION] = (
@@ -622,6 +624,8 @@ def DriverNameToDeviceProperties(
     # Once attached however the VID/PID elements change to relate to the
     # "filter driver" ?? so can no longer be used to match usbipd ids.
     DevProps.DeviceId = GetInstanceId(deviceInfo, deviceInfoData)
+    if status:
+        DevProps.DevInst = deviceInfoData.DevInst
 
     # status = GetDeviceProperty(deviceInfo,
     #                            byref(deviceInfoData),
@@ -1481,6 +1485,9 @@ def EnumerateHubPorts(hTreeParent: List, hHubDevice: HANDLE, bNumPorts: bytes):
                     unique = info.UsbDeviceProperties.DeviceId.split("\\")[2]
                     UsbipdInstanceId = f"USB\\VID_{vid:04X}&PID_{pid:04X}\\{unique}"
 
+                if not connectionInfoEx.DeviceIsHub and info.UsbDeviceProperties.DevInst:
+                    info.PortName = GetPortName(info.UsbDeviceProperties.DevInst)
+
                 parsed_devices[UsbipdInstanceId] = info
 
             hTreeParent.append((leafName, info))
@@ -2551,6 +2558,39 @@ def GetDeviceProperty(
     return True, ppBuffer.value
 
 
+def GetPortName(DevInst: int, depth: int = 2) -> str:
+    """
+    Find the COM port name of a usb device from the "PortName" value in the
+    Device Parameters key of the device itself or its child devnodes, ie. the
+    interfaces of a composite device and the ports of usb-serial bus drivers.
+    """
+    hKey = HKEY()
+    if CR_SUCCESS == CM_Open_DevNode_Key(
+        DevInst, KEY_QUERY_VALUE, 0, RegDisposition_OpenExisting, byref(hKey), CM_REGISTRY_HARDWARE
+    ):
+        try:
+            valueType = DWORD(0)
+            buffer = ctypes.create_unicode_buffer(64)
+            length = DWORD(sizeof(buffer))
+            if (
+                0 == RegQueryValueEx(hKey, "PortName", NULL, byref(valueType), buffer, byref(length))
+                and valueType.value == REG_SZ
+                and buffer.value.upper().startswith("COM")
+            ):
+                return buffer.value
+        finally:
+            RegCloseKey(hKey)
+
+    if depth:
+        child = DWORD(0)
+        status = CM_Get_Child(byref(child), DevInst, 0)
+        while status == CR_SUCCESS:
+            if portName := GetPortName(child.value, depth - 1):
+                return portName
+            status = CM_Get_Sibling(byref(child), child.value, 0)
+    return ""
+
+
 def GetInstanceId(deviceInfo: HDEVINFO, deviceInfoData: SP_DEVINFO_DATA):
     length = DWORD(0)
     status = SetupDiGetDeviceInstanceId(
@@ -670,6 +670,34 @@ CM_Get_Parent = ctypes.windll.setupapi.CM_Get_Parent
 CM_Get_Parent.argtypes = [POINTER(DWORD), DWORD, c_ulong]
 CM_Get_Parent.restype = c_ulong
 
+CM_Get_Child = ctypes.windll.setupapi.CM_Get_Child
+CM_Get_Child.argtypes = [POINTER(DWORD), DWORD, c_ulong]
+CM_Get_Child.restype = c_ulong
+
+CM_Get_Sibling = ctypes.windll.setupapi.CM_Get_Sibling
+CM_Get_Sibling.argtypes = [POINTER(DWORD), DWORD, c_ulong]
+CM_Get_Sibling.restype = c_ulong
+
+CR_SUCCESS = 0
+RegDisposition_OpenExisting = 0x00000001
+CM_REGISTRY_HARDWARE = 0x00000000  # "Device Parameters" key of the devnode
+KEY_QUERY_VALUE = 0x0001
+REG_SZ = 1
+
+# CMAPI CONFIGRET CM_Open_DevNode_Key([in] DEVINST dnDevNode, [in] REGSAM samDesired, [in] ULONG ulHardwareProfile,
+#                                     [in] REGDISPOSITION Disposition, [out] PHKEY phkDevice, [in] ULONG ulFlags);
+CM_Open_DevNode_Key = ctypes.windll.cfgmgr32.CM_Open_DevNode_Key
+CM_Open_DevNode_Key.argtypes = [DWORD, DWORD, c_ulong, DWORD, POINTER(HKEY), c_ulong]
+CM_Open_DevNode_Key.restype = c_ulong
+
+RegQueryValueEx = ctypes.windll.advapi32.RegQueryValueExW
+RegQueryValueEx.argtypes = [HKEY, LPCWSTR, LPDWORD, LPDWORD, LPVOID, LPDWORD]
+RegQueryValueEx.restype = LONG
+
+RegCloseKey = ctypes.windll.advapi32.RegCloseKey
+RegCloseKey.argtypes = [HKEY]
+RegCloseKey.restype = LONG
+
 CreateFile = ctypes.windll.kernel32.CreateFileW
 CreateFile.argtypes = [
             LPWSTR,                    # _In_          LPCTSTR lpFileName
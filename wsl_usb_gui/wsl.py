@@ -0,0 +1,405 @@
+import asyncio
+import os
+from typing import *
+
+from .logger import log
+from .process import CREATE_NO_WINDOW, ProcResult
+
+
+class WslShell:
+    """
+    Long lived root shell in the default WSL distro.
+
+    Starting `wsl.exe` for every command costs anything up to several seconds
+    (more if the VM needs to boot), so commands are instead written to one
+    persistent `sh` session. Each command's output is framed by a unique
+    sentinel carrying its exit status, followed by its stderr and a closing
+    sentinel. The shell is restarted automatically if it has exited.
+
+    The shell holds the WSL VM open, so it's closed again once it has been idle
+    for idle_timeout seconds, letting the VM shut down unless something else
+    (eg. KeepWarm) is keeping it.
+    """
+
+    # Shell variable holding the path of this shell's stderr file, made with mktemp
+    # as a fixed path could clash with (or be raced by) other sessions / users.
+    ERR_VAR = "WSL_USB_GUI_STDERR"
+
+    def __init__(self, args=("wsl", "--user", "root", "sh"), idle_timeout: float = 60.0):
+        self.args = args
+        self.idle_timeout = idle_timeout
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._count = 0
+        self._last_used = 0.0
+        self._idle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def _start(self):
+        self._proc = await asyncio.create_subprocess_exec(
+            *self.args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            creationflags=CREATE_NO_WINDOW,
+            limit=16 * 1024 * 1024,
+        )
+        self._proc.stdin.write(
+            f"{self.ERR_VAR}=$(mktemp) || exit 1; trap 'rm -f \"${self.ERR_VAR}\"' EXIT\n".encode()
+        )
+        log.info(f"WSL shell started (pid {self._proc.pid})")
+
+    def _kill(self):
+        if self.running:
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
+        self._proc = None
+
+    async def close(self):
+        if self._idle is not None:
+            self._idle.cancel()
+            self._idle = None
+        await self._close()
+
+    async def _close(self):
+        if self.running:
+            try:
+                self._proc.stdin.close()
+                await asyncio.wait_for(self._proc.wait(), 2)
+            except Exception:
+                pass
+        self._kill()
+
+    def _schedule_idle_close(self):
+        loop = asyncio.get_running_loop()
+        self._last_used = loop.time()
+        if self._idle is not None:
+            self._idle.cancel()
+        self._idle = loop.call_later(
+            self.idle_timeout, lambda: asyncio.ensure_future(self._close_if_idle())
+        )
+
+    async def _close_if_idle(self):
+        self._idle = None
+        async with self._lock:
+            # A command may have run while waiting for the lock
+            if self.running and asyncio.get_running_loop().time() - self._last_used >= self.idle_timeout:
+                log.info(f"WSL shell idle for {self.idle_timeout:.0f}s, closing")
+                await self._close()
+
+    async def run(self, command: str, timeout: Optional[float] = 60) -> ProcResult:
+        """
+        Run command (sh syntax) as root in WSL, returns once it has completed.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                return await self._run(command, timeout)
+            finally:
+                self._schedule_idle_close()
+
+    async def _run(self, command: str, timeout: Optional[float]) -> ProcResult:
+        for attempt in range(2):
+            if not self.running:
+                await self._start()
+            self._count += 1
+            token = f"WSL_USB_GUI_{os.getpid()}_{self._count}_{os.urandom(4).hex()}"
+            try:
+                self._proc.stdin.write(
+                    f"{{ {command}\n}} </dev/null 2>\"${self.ERR_VAR}\"; "
+                    f"printf '\\036{token} %d\\n' $?; "
+                    f"cat \"${self.ERR_VAR}\"; printf '\\036{token}\\n'\n".encode()
+                )
+                await self._proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as ex:
+                # Shell died while idle, the command never ran so it's safe to retry.
+                log.warning(f"WSL shell exited ({ex}), restarting")
+                self._kill()
+                continue
+
+            try:
+                return await asyncio.wait_for(self._read_response(token), timeout)
+            except asyncio.TimeoutError:
+                log.error(f"WSL shell command timed out: {command}")
+                self._kill()
+                return ProcResult("", "timeout", -1)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as ex:
+                log.error(f"WSL shell failed running command: {ex}")
+                self._kill()
+                return ProcResult("", str(ex), -1)
+
+        return ProcResult("", "WSL shell could not be started", -1)
+
+    async def _read_response(self, token: str) -> ProcResult:
+        marker = f"\x1e{token}".encode()
+        stdout = await self._proc.stdout.readuntil(marker)
+        status = await self._proc.stdout.readuntil(b"\n")
+        stderr = await self._proc.stdout.readuntil(marker + b"\n")
+        return ProcResult(
+            stdout[:-len(marker)].decode(errors="replace"),
+            stderr[:-len(marker) - 1].decode(errors="replace"),
+            int(status.strip()),
+        )
+
+
+DeviceKey = Tuple[str, str, Optional[str]]  # (vid, pid, serial)
+
+
+class UdevMonitor:
+    """
+    Streams `udevadm monitor --udev` from WSL to tell when an attached device is
+    actually usable, ie. its device node(s) have been created and udev rules run.
+
+    Register interest with expect() before attaching a device, the returned
+    future resolves with (seconds taken, device node) on the first matching
+    udev "add" / "bind" event carrying a device node.
+    """
+
+    SUBSYSTEMS = ("usb", "tty", "hidraw")
+
+    def __init__(self, args=("wsl", "--user", "root", "udevadm", "monitor", "--udev", "--property")):
+        self.args = list(args) + [f"--subsystem-match={s}" for s in self.SUBSYSTEMS]
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._waiters: List[Tuple[DeviceKey, float, asyncio.Future]] = []
+        # Most recent time-to-ready and device node of each currently attached device
+        self.ready: Dict[DeviceKey, Tuple[float, str]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self, timeout=10.0):
+        if self.running:
+            return
+        self._proc = await asyncio.create_subprocess_exec(
+            *self.args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            creationflags=CREATE_NO_WINDOW,
+        )
+        # udevadm prints a banner once it's listening, don't miss events before then
+        try:
+            await asyncio.wait_for(self._proc.stdout.readline(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("udevadm monitor slow to start")
+        log.info(f"udev monitor started (pid {self._proc.pid})")
+        asyncio.create_task(self._read_events(self._proc))
+
+    async def close(self):
+        if self.running:
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
+        self._proc = None
+
+    def expect(self, vid, pid, serial=None) -> asyncio.Future:
+        """
+        Future resolving when the device next becomes ready, serial None matches any.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(((vid.lower(), pid.lower(), serial), loop.time(), future))
+        return future
+
+    async def wait_ready(self, vid, pid, serial=None, timeout=None) -> Tuple[float, str]:
+        """
+        Wait until the device is ready, returning immediately if it already is.
+        """
+        key = (vid.lower(), pid.lower(), serial)
+        for ready_key, ready in self.ready.items():
+            if self._matches(key, ready_key):
+                return ready
+        return await asyncio.wait_for(self.expect(vid, pid, serial), timeout)
+
+    def ready_time(self, vid, pid, serial=None) -> Optional[float]:
+        key = (vid.lower(), pid.lower(), serial)
+        for ready_key, ready in self.ready.items():
+            if self._matches(key, ready_key):
+                return ready[0]
+        return None
+
+    @staticmethod
+    def _matches(expected: DeviceKey, actual: DeviceKey) -> bool:
+        # Windows reports serial numbers upper case in instance ids
+        return expected[:2] == actual[:2] and (
+            expected[2] is None or expected[2].upper() == (actual[2] or "").upper()
+        )
+
+    async def _read_events(self, proc):
+        event: Dict[str, str] = {}
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            line = line.decode(errors="replace").strip()
+            if not line:
+                if event:
+                    self._handle(event)
+                event = {}
+            elif "=" in line:
+                key, _, value = line.partition("=")
+                event[key] = value
+        log.warning("udev monitor exited")
+        if self._proc is proc:
+            self._proc = None
+
+    def _handle(self, event: Dict[str, str]):
+        vid, pid = event.get("ID_VENDOR_ID"), event.get("ID_MODEL_ID")
+        if not (vid and pid):
+            # Kernel PRODUCT is "vid/pid/bcd" in unpadded hex
+            try:
+                vid, pid = (f"{int(v, 16):04x}" for v in event["PRODUCT"].split("/")[:2])
+            except (KeyError, ValueError):
+                return
+        key = (vid.lower(), pid.lower(), event.get("ID_SERIAL_SHORT"))
+
+        action = event.get("ACTION")
+        if action == "remove":
+            self.ready.pop(key, None)
+            return
+        devname = event.get("DEVNAME")
+        if action not in ("add", "bind") or not devname:
+            return
+
+        now = asyncio.get_running_loop().time()
+        for waiter in list(self._waiters):
+            expected, start, future = waiter
+            if self._matches(expected, key):
+                self._waiters.remove(waiter)
+                if not future.done():
+                    elapsed = now - start
+                    self.ready[key] = (elapsed, devname)
+                    log.info(f"USB {vid}:{pid} ready in WSL at {devname} after {elapsed:.2f}s")
+                    future.set_result((elapsed, devname))
+        # Drop waiters that have been cancelled / timed out
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+
+
+class KeepWarm:
+    """
+    Holds an idle process open in WSL so the VM isn't shut down after going idle,
+    otherwise the next attach has to wait for it to boot again.
+
+    The process is restarted if it exits (eg. `wsl --shutdown`), each (re)start
+    measures the time taken for the VM to come up.
+    """
+
+    RESTART_DELAY = 5
+
+    def __init__(self, args=("wsl", "--user", "root", "sh", "-c", "echo ready; exec cat >/dev/null")):
+        self.args = args
+        self.enabled = False
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._task: Optional[asyncio.Task] = None
+        # Seconds taken for WSL to respond on the most recent start
+        self.start_latency: Optional[float] = None
+        # Most recent measure() result, if any this session
+        self.last_cost: Optional[Tuple[int, float]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    def update(self, enabled: bool):
+        """
+        Start or stop holding the VM open.
+        """
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            self._task = asyncio.create_task(self._supervise())
+        else:
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+            if self._proc is not None:
+                self._stop(self._proc)
+        log.info(f"WSL keep warm {'enabled' if enabled else 'disabled'}")
+
+    def _stop(self, proc: asyncio.subprocess.Process):
+        # Each supervisor only stops its own process, a cancelled one may still be
+        # cleaning up after a new one has been started.
+        if proc.returncode is None:
+            try:
+                # cat exits at end of input
+                proc.stdin.close()
+                proc.kill()
+            except (ProcessLookupError, OSError):
+                pass
+        if self._proc is proc:
+            self._proc = None
+
+    async def close(self):
+        self.update(False)
+
+    async def _supervise(self):
+        loop = asyncio.get_running_loop()
+        proc = None
+        try:
+            while True:
+                start = loop.time()
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        *self.args,
+                        stdin=asyncio.subprocess.PIPE,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.DEVNULL,
+                        creationflags=CREATE_NO_WINDOW,
+                    )
+                except OSError as ex:
+                    log.error(f"Could not start WSL keep warm process: {ex}")
+                    await asyncio.sleep(self.RESTART_DELAY)
+                    continue
+                self._proc = proc
+                if (await proc.stdout.readline()).strip() == b"ready":
+                    self.start_latency = loop.time() - start
+                    log.info(f"WSL keep warm started in {self.start_latency:.2f}s (pid {proc.pid})")
+                await proc.wait()
+                log.warning(f"WSL keep warm process exited ({proc.returncode})")
+                if self._proc is proc:
+                    self._proc = None
+                await asyncio.sleep(self.RESTART_DELAY)
+        finally:
+            if proc is not None:
+                self._stop(proc)
+
+    async def measure(self, shell) -> Optional[Tuple[int, float]]:
+        """
+        cost(), kept as last_cost. Starts WSL if it isn't running.
+        """
+        self.last_cost = await self.cost(shell)
+        return self.last_cost
+
+    @staticmethod
+    async def cost(shell) -> Optional[Tuple[int, float]]:
+        """
+        Memory used by the WSL VM (MB) and its cpu usage (%) sampled over a second.
+        """
+        # Two separate samples, so the shell isn't held for the second in between
+        first = await shell.run("head -n1 /proc/stat")
+        await asyncio.sleep(1)
+        result = await shell.run(
+            "head -n1 /proc/stat; grep -E '^(MemTotal|MemAvailable):' /proc/meminfo"
+        )
+        try:
+            lines = first.stdout.splitlines()[:1] + result.stdout.splitlines()
+            before, after = ([int(v) for v in l.split()[1:]] for l in lines[:2])
+            # idle + iowait
+            idle = (after[3] + after[4]) - (before[3] + before[4])
+            total = sum(after) - sum(before)
+            cpu = 100.0 * (total - idle) / total if total else 0.0
+            meminfo = {l.split(":")[0]: int(l.split()[1]) for l in lines[2:4]}
+            memory = (meminfo["MemTotal"] - meminfo["MemAvailable"]) // 1024
+            return memory, cpu
+        except (ValueError, IndexError, KeyError) as ex:
+            log.warning(f"Could not read WSL resource usage: {ex} {result.stderr}")
+            return None